@@ -0,0 +1,125 @@
+import json
+import logging
+import re
+import threading
+import time
+
+import requests
+from django.conf import settings
+from google.auth import exceptions as google_exceptions
+from google.auth import jwt as google_jwt
+from google.auth.transport.requests import Request
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+# Used when the certificate response has no usable cache headers
+DEFAULT_CERTS_MAX_AGE = 60 * 60
+
+# Refreshes started this long before expiry run in the background
+CERTS_REFRESH_MARGIN = 5 * 60
+
+# An unknown key id forces a refetch at most this often, so forged kids cannot hammer Google
+UNKNOWN_KID_REFETCH_INTERVAL = 60
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+def _max_age(headers):
+    """Seconds the response may be cached for, from Cache-Control max-age less Age."""
+    match = _MAX_AGE.search(headers.get('cache-control', ''))
+    if not match:
+        return DEFAULT_CERTS_MAX_AGE
+    try:
+        age = int(headers.get('age', 0))
+    except ValueError:
+        age = 0
+    return max(int(match.group(1)) - age, 0)
+
+
+class GoogleCertCache:
+    """
+    Google's signing certificates, kept in process memory for as long as the
+    response's cache headers allow. A lookup close to expiry starts one
+    background refresh and keeps serving the current certificates, so only
+    the very first sign-in, or one after the certificates lapsed entirely,
+    waits on Google.
+    """
+
+    def __init__(self, url=GOOGLE_CERTS_URL):
+        self.url = url
+        self._certs = None
+        self._expires_at = 0
+        self._last_fetch = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        # One pooled session for every fetch
+        self._request = Request(session=requests.Session())
+
+    def _fetch(self):
+        response = self._request(self.url, method='GET', timeout=getattr(settings, 'GOOGLE_CERTS_TIMEOUT', 10))
+        if response.status != 200:
+            raise google_exceptions.TransportError(f'Could not fetch certificates at {self.url}')
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        certs = json.loads(response.data.decode('utf-8'))
+        with self._lock:
+            self._certs = certs
+            self._expires_at = time.monotonic() + _max_age(headers)
+            self._last_fetch = time.monotonic()
+        return certs
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self._fetch()
+            except Exception:
+                logger.exception('Background refresh of Google certificates failed')
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, name='google-certs-refresh', daemon=True).start()
+
+    def get(self):
+        """The current certificates, {key id: PEM certificate}."""
+        remaining = self._expires_at - time.monotonic()
+        if self._certs is None or remaining <= 0:
+            return self._fetch()
+        if remaining <= CERTS_REFRESH_MARGIN:
+            self._refresh_in_background()
+        return self._certs
+
+    def get_for_key(self, key_id):
+        """
+        The certificates, refetched first if key_id is not among them, which
+        happens when Google rotates keys before the cached response expires.
+        """
+        certs = self.get()
+        if key_id in certs or time.monotonic() - self._last_fetch < UNKNOWN_KID_REFETCH_INTERVAL:
+            return certs
+        return self._fetch()
+
+
+_cert_cache = GoogleCertCache()
+
+
+def verify_google_id_token(token, audience):
+    """
+    Decoded claims of a Google ID token, verified locally against the cached
+    certificates. Raises ValueError if the token is malformed, expired, has
+    a bad signature or was not issued by Google for audience.
+    """
+    header = google_jwt.decode_header(token)
+    certs = _cert_cache.get_for_key(header.get('kid'))
+    claims = google_jwt.decode(token, certs=certs, audience=audience)
+    if claims.get('iss') not in GOOGLE_ISSUERS:
+        raise ValueError(f'Wrong issuer. \'iss\' should be one of the following: {GOOGLE_ISSUERS}')
+    return claims
+
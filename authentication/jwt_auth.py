@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def _user_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def _version_key(user_id):
+    return f'auth_user_version:{user_id}'
+
+
+def _cache_timeout():
+    return getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60)
+
+
+def invalidate_cached_user(*user_pks):
+    """
+    Bumps the users' profile versions once the current transaction commits,
+    so requests stop serving the cached rows and load them again.
+    """
+    def bump():
+        for user_pk in user_pks:
+            key = _version_key(user_pk)
+            # add then incr, so concurrent bumps never lose one
+            cache.add(key, 0, _cache_timeout() * 10)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, _cache_timeout() * 10)
+
+    transaction.on_commit(bump)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that serves the token's user from the cache for up to
+    JWT_USER_CACHE_TIMEOUT seconds. Each entry carries the profile version it
+    was loaded at and is ignored once invalidate_cached_user bumps it, so an
+    entry written by a request that raced an update is never served.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user_key, version_key = _user_key(user_id), _version_key(user_id)
+        cached = cache.get_many([user_key, version_key])
+        version = cached.get(version_key, 0)
+        entry = cached.get(user_key)
+        if entry is None or entry[0] != version:
+            user = super().get_user(validated_token)
+            cache.set(user_key, (version, user), _cache_timeout())
+            return user
+
+        user = entry[1]
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_phoneotp'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='phoneotp',
+            old_name='attempts',
+            new_name='failed_attempts',
+        ),
+        migrations.AlterField(
+            model_name='phoneotp',
+            name='code_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='phoneotp',
+            name='last_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='phoneotp',
+            name='sends',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='phoneotp',
+            name='window_started_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -58,6 +58,7 @@ class CustomUser(AbstractBaseUser, BaseUserModel, PermissionsMixin):
     level = models.IntegerField(default=1, db_index=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    role_version = models.PositiveIntegerField(default=0)  # Bumped on venue role changes, revokes role claims in issued tokens
 
     objects = BaseUserManager()
 
@@ -77,6 +78,17 @@ class Waiter(models.Model):
     venue = models.ForeignKey('partner.Venue', on_delete=models.CASCADE, null=True, blank=True, related_name='waiters', db_index=True)
     managers = models.ManyToManyField(Manager, related_name='waiters')
 
+class PhoneOTP(models.Model):
+    # One row per number with a keyed hash of its live code, shared by every process
+    phone_number = models.CharField(max_length=15, unique=True)
+    code_hash = models.CharField(max_length=64, blank=True)  # Empty once the code is used or discarded
+    expires_at = models.DateTimeField()
+    # Throttling state for the current OTP_THROTTLE_WINDOW, kept across reissues
+    window_started_at = models.DateTimeField()
+    sends = models.PositiveSmallIntegerField(default=0)
+    last_sent_at = models.DateTimeField(null=True, blank=True)
+    failed_attempts = models.PositiveSmallIntegerField(default=0)
+
 
 
 class RequestedOwner(models.Model):
@@ -0,0 +1,277 @@
+import hashlib
+import hmac
+import logging
+import random
+import re
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import Throttled
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+from .models import PhoneOTP
+
+logger = logging.getLogger(__name__)
+
+COUNTRY_CODE = '+91'
+
+# Ten digit Indian mobile numbers, without the country code
+PHONE_NUMBER_RE = re.compile(r'[6-9]\d{9}')
+
+_client = None
+_client_lock = threading.Lock()
+
+_transport = None
+_transport_lock = threading.Lock()
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+class TransientOTPError(Exception):
+    """A send that failed for a reason worth retrying, a timeout or a provider side error."""
+
+
+def twilio_client():
+    """
+    The process wide Twilio client. Its HTTP client keeps a pooled session,
+    so sends after the first reuse the open TLS connection to the provider.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http_client = TwilioHttpClient(
+                    pool_connections=True,
+                    timeout=getattr(settings, 'TWILIO_HTTP_TIMEOUT', 10),
+                )
+                _client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+    return _client
+
+
+def is_valid_phone_number(phone_number):
+    return isinstance(phone_number, str) and PHONE_NUMBER_RE.fullmatch(phone_number) is not None
+
+
+class OTPTransport(ABC):
+    """Delivers a code to a phone number, raising TransientOTPError when the send may be retried."""
+
+    @abstractmethod
+    def send(self, phone_number, code):
+        """Sends code to phone_number."""
+
+
+class TwilioSMSTransport(OTPTransport):
+    """Sends the code as a plain SMS from TWILIO_FROM_NUMBER."""
+
+    def __init__(self):
+        # Twilio would reject every send with a 400 that only reaches the dispatcher's log
+        missing = [name for name in ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_FROM_NUMBER')
+                   if not getattr(settings, name, None)]
+        if missing:
+            raise ImproperlyConfigured(f"{', '.join(missing)} must be set to send OTPs over Twilio.")
+
+    def send(self, phone_number, code):
+        try:
+            twilio_client().messages.create(
+                to=COUNTRY_CODE + phone_number,
+                from_=settings.TWILIO_FROM_NUMBER,
+                body=f'Your verification code is {code}. It expires in {otp_ttl() // 60} minutes.',
+            )
+        except TwilioRestException as e:
+            if e.status == 429 or e.status >= 500:
+                raise TransientOTPError(str(e)) from e
+            raise
+        except (RequestsConnectionError, Timeout) as e:
+            raise TransientOTPError(str(e)) from e
+
+
+class FakeOTPTransport(OTPTransport):
+    """
+    Records sends in memory instead of calling a provider, for development and
+    load tests. OTP_FAKE_LATENCY adds a delay per send to mimic the provider.
+    """
+
+    def __init__(self):
+        self.sent = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def send(self, phone_number, code):
+        latency = getattr(settings, 'OTP_FAKE_LATENCY', 0)
+        if latency:
+            time.sleep(latency)
+        with self._lock:
+            self.sent.append((phone_number, code))
+        logger.info('Fake OTP sent to %s', phone_number)
+
+    def last_code(self, phone_number):
+        with self._lock:
+            for sent_to, code in reversed(self.sent):
+                if sent_to == phone_number:
+                    return code
+        return None
+
+
+def get_transport():
+    """The transport named by OTP_TRANSPORT, created once per process."""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                path = getattr(settings, 'OTP_TRANSPORT', 'authentication.otp.TwilioSMSTransport')
+                _transport = import_string(path)()
+    return _transport
+
+
+def deliver_otp(phone_number, code, transport=None):
+    """
+    Sends a code, retrying transient failures up to OTP_SEND_ATTEMPTS times
+    with exponential backoff and jitter. Returns whether the send went out.
+    """
+    transport = transport or get_transport()
+    attempts = getattr(settings, 'OTP_SEND_ATTEMPTS', 3)
+    backoff = getattr(settings, 'OTP_SEND_BACKOFF', 0.5)
+
+    for attempt in range(1, attempts + 1):
+        try:
+            transport.send(phone_number, code)
+            return True
+        except TransientOTPError as e:
+            if attempt == attempts:
+                logger.error('OTP send to %s failed after %s attempts: %s', phone_number, attempts, e)
+                return False
+            delay = backoff * 2 ** (attempt - 1)
+            time.sleep(delay + random.uniform(0, delay))
+        except Exception:
+            logger.exception('OTP send to %s failed', phone_number)
+            return False
+    return False
+
+
+def otp_ttl():
+    return getattr(settings, 'OTP_TTL', 5 * 60)
+
+
+def is_test_number(phone_number):
+    return phone_number in getattr(settings, 'OTP_TEST_NUMBERS', ())
+
+
+def _hash_code(phone_number, code):
+    # Keyed with SECRET_KEY, the six digit space is too small for a bare hash to hide a code
+    message = f'{phone_number}:{code}'.encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _throttle_window():
+    return timedelta(seconds=getattr(settings, 'OTP_THROTTLE_WINDOW', 60 * 60))
+
+
+def _wait_seconds(until, now):
+    return max(int((until - now).total_seconds()) + 1, 1)
+
+
+def issue_otp(phone_number):
+    """
+    Generates a fresh code for phone_number and stores only its keyed hash in
+    the database, where every process and instance can verify it, for
+    OTP_TTL seconds. Issuing replaces any earlier code. Raises Throttled
+    inside OTP_RESEND_COOLDOWN of the last send, after
+    OTP_MAX_SENDS_PER_WINDOW sends in the window, and while the number's
+    wrong guesses are used up, which a reissue does not reset.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        otp, _ = PhoneOTP.objects.select_for_update().get_or_create(
+            phone_number=phone_number,
+            defaults={'expires_at': now, 'window_started_at': now},
+        )
+        window_end = otp.window_started_at + _throttle_window()
+        if window_end <= now:
+            otp.window_started_at, otp.sends, otp.failed_attempts = now, 0, 0
+            window_end = now + _throttle_window()
+
+        cooldown = timedelta(seconds=getattr(settings, 'OTP_RESEND_COOLDOWN', 60))
+        if otp.last_sent_at is not None and otp.last_sent_at + cooldown > now:
+            raise Throttled(_wait_seconds(otp.last_sent_at + cooldown, now), 'Please wait before requesting another OTP.')
+        if otp.sends >= getattr(settings, 'OTP_MAX_SENDS_PER_WINDOW', 5):
+            raise Throttled(_wait_seconds(window_end, now), 'Too many OTPs requested for this number.')
+        if otp.failed_attempts >= getattr(settings, 'OTP_MAX_ATTEMPTS', 5):
+            raise Throttled(_wait_seconds(window_end, now), 'Too many wrong OTPs entered for this number.')
+
+        digits = getattr(settings, 'OTP_DIGITS', 6)
+        code = ''.join(secrets.choice('0123456789') for _ in range(digits))
+        otp.code_hash = _hash_code(phone_number, code)
+        otp.expires_at = now + timedelta(seconds=otp_ttl())
+        otp.last_sent_at = now
+        otp.sends += 1
+        otp.save()
+    return code
+
+
+def verify_otp(phone_number, code):
+    """
+    Whether code is the live code for phone_number, checked locally in
+    constant time. A matching code is consumed. After OTP_MAX_ATTEMPTS wrong
+    guesses in the throttle window the code is discarded, and the number
+    gets no new code until the window ends.
+    """
+    code = str(code or '')
+    if is_test_number(phone_number):
+        return hmac.compare_digest(code, getattr(settings, 'OTP_TEST_CODE', '123456'))
+
+    # The row lock keeps the attempt counter exact under concurrent guesses
+    with transaction.atomic():
+        otp = PhoneOTP.objects.select_for_update().filter(phone_number=phone_number).first()
+        if otp is None or not otp.code_hash or otp.expires_at <= timezone.now():
+            return False
+        if otp.failed_attempts >= getattr(settings, 'OTP_MAX_ATTEMPTS', 5):
+            return False
+
+        if not hmac.compare_digest(otp.code_hash, _hash_code(phone_number, code)):
+            otp.failed_attempts += 1
+            if otp.failed_attempts >= getattr(settings, 'OTP_MAX_ATTEMPTS', 5):
+                otp.code_hash = ''
+            otp.save(update_fields=['failed_attempts', 'code_hash'])
+            return False
+
+        otp.code_hash = ''
+        otp.failed_attempts = 0
+        otp.save(update_fields=['failed_attempts', 'code_hash'])
+        return True
+
+
+def _get_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'OTP_DISPATCH_WORKERS', 4),
+                    thread_name_prefix='otp-dispatch',
+                )
+    return _dispatcher
+
+
+def queue_otp(phone_number):
+    """
+    Issues a code for phone_number and hands its delivery to the background
+    dispatcher, returning the future without waiting for the provider. The
+    transport is resolved first, so a misconfigured one fails the request
+    instead of every send.
+    """
+    transport = get_transport()
+    code = issue_otp(phone_number)
+    return _get_dispatcher().submit(deliver_otp, phone_number, code, transport)
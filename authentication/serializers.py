@@ -63,12 +63,6 @@ class ManagerSerializer(serializers.ModelSerializer):
         model = Manager
         fields = ['user', 'venue', 'owners']  # Manager-specific fields only
 
-    def to_representation(self, instance):
-        # Custom representation to handle ManyToManyField
-        ret = super().to_representation(instance)
-        ret['owners'] = [owner.user_id for owner in instance.owners.all()]
-        return ret
-
 
 class WaiterSerializer(serializers.ModelSerializer):
     user = CustomUserSerializer()  # Nested serializer
@@ -77,11 +71,6 @@ class WaiterSerializer(serializers.ModelSerializer):
         model = Waiter
         fields = ['user', 'venue', 'managers']
 
-    def to_representation(self, instance):
-        ret = super().to_representation(instance)
-        ret['managers'] = [manager.user_id for manager in instance.managers.all()]
-        return ret
-
 class RequestedOwnerSerializer(serializers.ModelSerializer):
     class Meta:
         model = RequestedOwner
@@ -116,4 +105,18 @@ class StaffVerificationSerializer(serializers.Serializer):
         if role in ['MANAGER', 'WAITER'] and not venue_id:
             raise ValidationError('venue_id is required for manager and waiter roles')
         
-        return attrs
\ No newline at end of file
+        return attrs
+
+class BulkStaffVerificationSerializer(serializers.Serializer):
+    MAX_STAFF = 500
+
+    # Checked before any row is validated
+    staff = StaffVerificationSerializer(many=True, allow_empty=False, max_length=MAX_STAFF)
+
+    def validate_staff(self, value):
+        seen = set()
+        for row in value:
+            if row['phone_number'] in seen:
+                raise ValidationError(f"{row['phone_number']} appears more than once")
+            seen.add(row['phone_number'])
+        return value
\ No newline at end of file
@@ -0,0 +1,193 @@
+import csv
+import io
+
+from django.db import transaction
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from partner.models import Venue
+from partner.permissions import OWNER, MANAGER, invalidate_venue_roles, has_venue_role
+from .models import CustomUser, Owner, Manager, Waiter
+
+CSV_FIELDS = ('role', 'phone_number', 'name', 'email', 'venue_id')
+
+NOT_VENUE_STAFF = {
+    OWNER: 'You are not an owner of this venue',
+    MANAGER: 'You are not a manager of this venue',
+}
+
+ROLE_MODELS = {
+    'CO_OWNER': Owner,
+    'MANAGER': Manager,
+    'WAITER': Waiter,
+}
+
+
+class StaffRowsError(Exception):
+    """Rows that cannot be added, as {'index', 'phone_number', 'error'} dicts."""
+
+    def __init__(self, errors):
+        super().__init__('No staff were added')
+        self.errors = errors
+
+
+def parse_staff_csv(upload, defaults=None, max_rows=None):
+    """
+    Rows of a staff CSV with a header line naming any of CSV_FIELDS. Values
+    missing from a row are taken from defaults, so a file of waiters for one
+    venue only needs phone_number and name columns. The file is decoded as
+    it is read, and reading stops with a ValidationError once it has more
+    than max_rows rows.
+    """
+    rows = []
+    try:
+        for line in csv.DictReader(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')):
+            if max_rows is not None and len(rows) >= max_rows:
+                raise ValidationError(f'At most {max_rows} staff can be added at once')
+            row = {field: value for field, value in (defaults or {}).items() if value}
+            for field in CSV_FIELDS:
+                value = (line.get(field) or '').strip()
+                if value:
+                    row[field] = value
+            rows.append(row)
+    except UnicodeDecodeError:
+        raise ValidationError('The staff file must be UTF-8 encoded CSV')
+    return rows
+
+
+def _check_requester(user_type, roles):
+    if roles & {'CO_OWNER', 'MANAGER'} and user_type != OWNER:
+        raise PermissionDenied('Only owners can add co-owners and managers')
+    if user_type not in [OWNER, MANAGER]:
+        raise PermissionDenied('Only owners or managers can add waiters')
+
+
+def onboard_staff(request, rows):
+    """
+    Adds validated staff rows (role, phone_number, name, email, venue_id) in
+    one transaction with a fixed number of queries: existing users are read
+    with one IN query, missing users, role rows and their many-to-many links
+    are written with bulk_create. Nothing is written unless every row can be
+    added, otherwise StaffRowsError lists the rows that cannot.
+    """
+    user_type = (request.auth.payload.get('user_type') or '').lower()
+    _check_requester(user_type, {row['role'] for row in rows})
+
+    errors = []
+
+    with transaction.atomic():
+        # Co-owners join one of the requesting owner's venues, as they do one at a time
+        co_owner_venue = None
+        if any(row['role'] == 'CO_OWNER' for row in rows):
+            co_owner_venue = Venue.objects.filter(owners__user=request.user).first()
+            if co_owner_venue is None:
+                raise ValidationError('Requesting owner has no venues')
+
+        venues = {
+            venue.venue_id: venue
+            for venue in Venue.objects.filter(
+                venue_id__in={row['venue_id'] for row in rows if row['role'] != 'CO_OWNER'}
+            )
+        }
+        row_venues = []
+        for index, row in enumerate(rows):
+            if row['role'] == 'CO_OWNER':
+                row_venues.append(co_owner_venue)
+                continue
+            venue = venues.get(row['venue_id'])
+            if venue is None:
+                errors.append({'index': index, 'phone_number': row['phone_number'], 'error': 'Venue not found'})
+            elif not has_venue_role(request, venue.venue_id, user_type):
+                errors.append({'index': index, 'phone_number': row['phone_number'], 'error': NOT_VENUE_STAFF[user_type]})
+            row_venues.append(venue)
+
+        users = {
+            user.phone_number: user
+            for user in CustomUser.objects.filter(phone_number__in=[row['phone_number'] for row in rows])
+        }
+
+        # Role rows are keyed by user, so a user can hold each role at one venue only
+        existing_roles = {}
+        for role, model in ROLE_MODELS.items():
+            candidates = [users[row['phone_number']].pk for row in rows
+                          if row['role'] == role and row['phone_number'] in users]
+            if not candidates:
+                continue
+            if model is Owner:
+                existing_roles[role] = dict.fromkeys(model.objects.filter(user_id__in=candidates).values_list('user_id', flat=True))
+            else:
+                existing_roles[role] = dict(model.objects.filter(user_id__in=candidates).values_list('user_id', 'venue_id'))
+
+        for index, row in enumerate(rows):
+            user = users.get(row['phone_number'])
+            existing = existing_roles.get(row['role'], {})
+            if user is None or user.pk not in existing:
+                continue
+            if row['role'] == 'CO_OWNER':
+                error = 'User is already a co-owner'
+            elif row_venues[index] is not None and existing[user.pk] == row_venues[index].pk:
+                error = f'User is already a {row["role"].lower()} for this venue'
+            else:
+                error = f'User is already a {row["role"].lower()} at another venue'
+            errors.append({'index': index, 'phone_number': row['phone_number'], 'error': error})
+
+        if errors:
+            raise StaffRowsError(sorted(errors, key=lambda error: error['index']))
+
+        new_users = [
+            CustomUser(
+                phone_number=row['phone_number'],
+                name=row['name'],
+                email=row.get('email'),
+                is_verified=True,
+                is_staff=row['role'] != 'WAITER',
+            )
+            for row in rows if row['phone_number'] not in users
+        ]
+        CustomUser.objects.bulk_create(new_users)
+        created_phone_numbers = {user.phone_number for user in new_users}
+        users.update({user.phone_number: user for user in new_users})
+
+        staff = [(row, users[row['phone_number']], row_venues[index]) for index, row in enumerate(rows)]
+        co_owners = [(user, venue) for row, user, venue in staff if row['role'] == 'CO_OWNER']
+        managers = [(user, venue) for row, user, venue in staff if row['role'] == 'MANAGER']
+        waiters = [(user, venue) for row, user, venue in staff if row['role'] == 'WAITER']
+
+        VenueOwners = Venue.owners.through
+        Owner.objects.bulk_create([Owner(user=user) for user, venue in co_owners])
+        VenueOwners.objects.bulk_create([VenueOwners(venue_id=venue.pk, owner_id=user.pk) for user, venue in co_owners])
+
+        # Managers get every owner of their venue, including co-owners added above
+        Manager.objects.bulk_create([Manager(user=user, venue=venue) for user, venue in managers])
+        if managers:
+            venue_owners = {}
+            for venue_pk, owner_pk in VenueOwners.objects.filter(
+                venue_id__in={venue.pk for user, venue in managers}
+            ).values_list('venue_id', 'owner_id'):
+                venue_owners.setdefault(venue_pk, []).append(owner_pk)
+            Manager.owners.through.objects.bulk_create([
+                Manager.owners.through(manager_id=user.pk, owner_id=owner_pk)
+                for user, venue in managers for owner_pk in venue_owners.get(venue.pk, [])
+            ])
+
+        # Waiters get every manager of their venue, including managers added above
+        Waiter.objects.bulk_create([Waiter(user=user, venue=venue) for user, venue in waiters])
+        if waiters:
+            venue_managers = {}
+            for venue_pk, manager_pk in Manager.objects.filter(
+                venue_id__in={venue.pk for user, venue in waiters}
+            ).values_list('venue_id', 'user_id'):
+                venue_managers.setdefault(venue_pk, []).append(manager_pk)
+            Waiter.managers.through.objects.bulk_create([
+                Waiter.managers.through(waiter_id=user.pk, manager_id=manager_pk)
+                for user, venue in waiters for manager_pk in venue_managers.get(venue.pk, [])
+            ])
+
+        invalidate_venue_roles(*[user.pk for row, user, venue in staff])
+
+    return [{
+        'role': row['role'],
+        'phone_number': row['phone_number'],
+        'user_id': str(user.pk),
+        'venue_id': venue.venue_id,
+        'created': row['phone_number'] in created_phone_numbers,
+    } for row, user, venue in staff]
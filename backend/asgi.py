@@ -11,13 +11,13 @@ django_asgi_app = get_asgi_application()
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 from chat.middleware import JWTAuthMiddleware
-import chat.routing
+from backend.routing import websocket_urlpatterns
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         JWTAuthMiddleware(
-            URLRouter(chat.routing.websocket_urlpatterns)
+            URLRouter(websocket_urlpatterns)
         )
     ),
 })
\ No newline at end of file
@@ -0,0 +1,91 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+# Routing state of the current request, a mutable dict so the router can
+# record writes made from threads the request's context was copied into
+_routing_state = ContextVar('replica_routing_state', default=None)
+
+
+def replica_alias():
+    """Alias reads may go to, or None when no replica is configured."""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def _pin_key(user_pk):
+    return f'replica_pin:{user_pk}'
+
+
+def pin_to_primary(user_pk):
+    """Sends the user's reads to default for the next REPLICA_PIN_SECONDS."""
+    cache.set(_pin_key(user_pk), True, getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+
+
+def is_pinned_to_primary(user_pk):
+    return bool(cache.get(_pin_key(user_pk)))
+
+
+class ReplicaRouter:
+    """
+    Only views that opt in with ReplicaReadMixin read from the replica, and
+    only for safe methods. All writes and every read inside a transaction
+    stay on default, and so does the rest of a request once it has written.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if not state or not state['use_replica'] or state['wrote']:
+            return None
+        # A transaction on default must keep seeing its own uncommitted rows
+        if connections['default'].in_atomic_block:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Scopes the routing state to the request and pins users who wrote to default."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {'use_replica': False, 'wrote': False}
+        token = _routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+        # DRF copies the authenticated user back onto the Django request
+        user = getattr(request, 'user', None)
+        if state['wrote'] and replica_alias() and user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    For read-only views that tolerate replication lag. GET requests read from
+    the replica once the user is authenticated, unless the user wrote
+    something within the last REPLICA_PIN_SECONDS.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _routing_state.get()
+        if state is None or request.method not in SAFE_METHODS or not replica_alias():
+            return
+        user = request.user
+        if user is not None and user.is_authenticated and is_pinned_to_primary(user.pk):
+            return
+        state['use_replica'] = True
@@ -1,16 +1,5 @@
-import os
-from channels.routing import ProtocolTypeRouter, URLRouter
-from django.core.asgi import get_asgi_application
-from chat.routing import websocket_urlpatterns
-from chat.middleware import JWTWebsocketMiddleware
+from chat.routing import websocket_urlpatterns as chat_websocket_urlpatterns
+from venueservices.routing import websocket_urlpatterns as presence_websocket_urlpatterns
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
-
-application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": JWTWebsocketMiddleware(
-        URLRouter(
-            websocket_urlpatterns
-        )
-    ),
-})
\ No newline at end of file
+# Every websocket route served by backend.asgi.application
+websocket_urlpatterns = chat_websocket_urlpatterns + presence_websocket_urlpatterns
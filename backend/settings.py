@@ -73,6 +73,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # Add the account middleware:
     "allauth.account.middleware.AccountMiddleware",
+    "backend.db_router.ReplicaRoutingMiddleware",
 ]
 
 AUTHENTICATION_BACKENDS = [
@@ -105,7 +106,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
-ASGI_APPLICATION = 'backend.routing.application'
+ASGI_APPLICATION = 'backend.asgi.application'
 
 # CHANNEL_LAYERS = {
 #     "default": {
@@ -149,6 +150,44 @@ else:
         }
     }
 
+# Optional read replica for analytics and listing views, see backend/db_router.py.
+# Locally a second SQLite file works: DATABASE_REPLICA_URL=sqlite:////path/to/replica.sqlite3
+
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+REPLICA_DATABASE_ALIAS = "replica"
+
+if DATABASE_REPLICA_URL:
+    DATABASES[REPLICA_DATABASE_ALIAS] = dj_database_url.config(default=DATABASE_REPLICA_URL)
+    # Tests run against default only
+    DATABASES[REPLICA_DATABASE_ALIAS]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["backend.db_router.ReplicaRouter"]
+
+# Seconds a user's reads stay on default after they wrote, to cover replication lag
+REPLICA_PIN_SECONDS = 10
+
+# Cache
+# Redis when REDIS_URL is set, so every worker shares it, otherwise per-process memory
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "lasoiree",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            # Per-day analytics entries alone can exceed the default of 300
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -190,6 +229,31 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Processes used to render QR images for bulk table creation (defaults to CPU count)
+QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", "0")) or None
+
+# Format QR images are stored in, 'png' or 'svg' (larger files, opt-in for print)
+QR_IMAGE_FORMAT = os.getenv("QR_IMAGE_FORMAT", "png")
+
+# Batched location pings closer than this (metres) to the last applied one are dropped
+LOCATION_PING_MIN_MOVE_M = float(os.getenv("LOCATION_PING_MIN_MOVE_M", "15"))
+
+# Presences tracked over the presence socket are checked out after this many seconds without a heartbeat
+PRESENCE_HEARTBEAT_TIMEOUT = int(os.getenv("PRESENCE_HEARTBEAT_TIMEOUT", "90"))
+
+# Reverse geofence lookup: grid cell size in degrees (about 1 km), and how often each
+# process checks for venue changes and rebuilds regardless (seconds)
+GEOFENCE_INDEX_CELL_DEGREES = float(os.getenv("GEOFENCE_INDEX_CELL_DEGREES", "0.01"))
+GEOFENCE_INDEX_CHECK_INTERVAL = int(os.getenv("GEOFENCE_INDEX_CHECK_INTERVAL", "5"))
+GEOFENCE_INDEX_MAX_AGE = int(os.getenv("GEOFENCE_INDEX_MAX_AGE", "300"))
+
+# How long occupancy rollup buckets are kept, per resolution
+OCCUPANCY_ROLLUP_RETENTION_DAYS = {
+    "minute": int(os.getenv("OCCUPANCY_MINUTE_RETENTION_DAYS", "2")),
+    "hour": int(os.getenv("OCCUPANCY_HOUR_RETENTION_DAYS", "90")),
+    "day": int(os.getenv("OCCUPANCY_DAY_RETENTION_DAYS", "730")),
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -204,6 +268,29 @@ load_dotenv(os.path.join(BASE_DIR, ".env"))
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_SERVICE_SID = os.getenv("TWILIO_SERVICE_SID")
+TWILIO_FROM_NUMBER = os.getenv("TWILIO_FROM_NUMBER")
+TWILIO_HTTP_TIMEOUT = 10
+
+# Dotted path of the OTP transport, authentication.otp.FakeOTPTransport sends nothing
+OTP_TRANSPORT = os.getenv("OTP_TRANSPORT", "authentication.otp.TwilioSMSTransport")
+OTP_DISPATCH_WORKERS = 4
+OTP_SEND_ATTEMPTS = 3
+OTP_SEND_BACKOFF = 0.5
+OTP_TTL = 5 * 60
+OTP_DIGITS = 6
+# Per number: seconds between sends, sends and wrong guesses allowed per window
+OTP_RESEND_COOLDOWN = 60
+OTP_THROTTLE_WINDOW = 60 * 60
+OTP_MAX_SENDS_PER_WINDOW = 5
+OTP_MAX_ATTEMPTS = 5
+
+# Numbers that skip delivery and verify with OTP_TEST_CODE, comma separated
+OTP_TEST_NUMBERS = frozenset(filter(None, os.getenv(
+    "OTP_TEST_NUMBERS",
+    "9999999999,1111111111,2222222222,3333333333,7050858026,7483292173,7976251906,"
+    "9784752479,7987462827,6203077745,9810622772,6363640029,7330812741",
+).split(",")))
+OTP_TEST_CODE = os.getenv("OTP_TEST_CODE", "123456")
 
 
 SOCIALACCOUNT_PROVIDERS = {
@@ -230,7 +317,7 @@ GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # 'authentication.custom_jwt_auth.MultiModelJWTAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # For JWT
+        'authentication.jwt_auth.CachedJWTAuthentication',  # For JWT
         'rest_framework.authentication.SessionAuthentication',  # for Django admin
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -246,4 +333,10 @@ SIMPLE_JWT = {
     'TOKEN_OBTAIN_SERIALIZER': 'authentication.serializers.CustomTokenObtainPairSerializer',
     'BLACKLIST_AFTER_ROTATION': True,
     'ROTATE_REFRESH_TOKENS': True,
-}
\ No newline at end of file
+}
+
+# Staff tokens carry their venue roles up to this many venues, larger role maps are looked up instead
+JWT_VENUE_CLAIMS_MAX = 50
+
+# Authenticated users are served from the cache for this long, profile updates invalidate them sooner
+JWT_USER_CACHE_TIMEOUT = 60
\ No newline at end of file
@@ -0,0 +1,38 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_EXHAUSTED = object()
+
+
+async def iterate_in_thread(chunks):
+    """
+    Async iterator over a sync one, each chunk produced in Django's sync
+    thread, so database cursors stay on the connection that opened them and
+    the event loop is never blocked.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, _EXHAUSTED)
+            if chunk is _EXHAUSTED:
+                return
+            yield chunk
+    finally:
+        # Releases server-side cursors when the client disconnects mid-stream
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def streaming_response(request, chunks, **kwargs):
+    """
+    StreamingHttpResponse over a sync iterator that streams under both
+    servers. Under ASGI Django would collect a sync iterator into a list
+    before sending the first byte, so it is handed an async one instead.
+    """
+    django_request = getattr(request, '_request', request)
+    if isinstance(django_request, ASGIRequest):
+        chunks = iterate_in_thread(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
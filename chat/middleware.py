@@ -33,6 +33,7 @@ class JWTAuthMiddleware(BaseMiddleware):
             try:
                 validated_token = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
                 scope["user"] = await get_user(validated_token)
+                scope["token_payload"] = validated_token
             except jwt.ExpiredSignatureError:
                 scope["user"] = AnonymousUser()
             except jwt.InvalidTokenError:
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:58
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of partner.search as of this migration, so later changes to the
+# live tokenizer do not change what this migration builds
+FIELD_WEIGHTS = {
+    'item_name': 3,
+    'tag': 2,
+    'item_description': 1,
+}
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    if not text:
+        return []
+
+    tokens = []
+    for token in TOKEN_RE.findall(str(text).lower()):
+        if len(token) < MIN_TOKEN_LENGTH:
+            continue
+        token = token[:MAX_TOKEN_LENGTH]
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def menu_item_tokens(item_name, item_description, tag, tag_choices=None):
+    tag_label = dict(tag_choices or []).get(tag, '')
+    fields = {
+        'item_name': item_name,
+        'item_description': item_description,
+        'tag': f"{tag or ''} {tag_label}".replace('_', ' '),
+    }
+
+    weights = {}
+    for field, text in fields.items():
+        for token in tokenize(text):
+            weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS[field])
+    return weights
+
+
+def build_menu_search_index(apps, schema_editor):
+    Menu = apps.get_model('partner', 'Menu')
+    MenuSearchToken = apps.get_model('partner', 'MenuSearchToken')
+
+    tag_choices = Menu._meta.get_field('tag').choices
+    for item in Menu.objects.all().iterator():
+        tokens = menu_item_tokens(item.item_name, item.item_description, item.tag, tag_choices)
+        MenuSearchToken.objects.bulk_create([
+            MenuSearchToken(menu_item_id=item.pk, venue_id=item.venue_id, token=token, weight=weight)
+            for token, weight in tokens.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_requestedowner_details_completed_and_more'),
+        ('partner', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='venue',
+            name='owners',
+            field=models.ManyToManyField(related_name='owner_venues', to='authentication.owner'),
+        ),
+        migrations.CreateModel(
+            name='MenuSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='partner.menu')),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='menu_search_tokens', to='partner.venue')),
+            ],
+            options={
+                'unique_together': {('menu_item', 'token')},
+            },
+        ),
+        migrations.RunPython(build_menu_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:12
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations
+
+# Frozen copy of partner.qr.qr_storage_name as of this migration
+QR_RENDER_VERSION = 'v1:box10:border4'
+
+
+def qr_storage_name(payload, fmt, upload_to='qr_codes'):
+    digest = hashlib.sha256(f"{QR_RENDER_VERSION}:{fmt}:{payload}".encode()).hexdigest()
+    return f'{upload_to}/{digest[:2]}/{digest}.{fmt}'
+
+
+def point_tables_at_default_format(apps, schema_editor):
+    Table = apps.get_model('partner', 'Table')
+
+    tables = list(Table.objects.only('id', 'qr_code', 'qr_image'))
+    for table in tables:
+        table.qr_image = qr_storage_name(table.qr_code, getattr(settings, 'QR_IMAGE_FORMAT', 'png'))
+    Table.objects.bulk_update(tables, ['qr_image'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partner', '0003_table_qr_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.RunPython(point_tables_at_default_format, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+VENUE_ID = 'venue_id'
+VENUE_ID_DB_SEQUENCE = 'partner_venue_id_seq'
+
+
+def seed_venue_id_sequence(apps, schema_editor):
+    Venue = apps.get_model('partner', 'Venue')
+    IdSequence = apps.get_model('partner', 'IdSequence')
+
+    # Continue after the highest VENxxx handed out so far
+    last_value = 0
+    for venue_id in Venue.objects.values_list('venue_id', flat=True):
+        number = venue_id.replace('VEN', '')
+        if number.isdigit():
+            last_value = max(last_value, int(number))
+
+    IdSequence.objects.update_or_create(name=VENUE_ID, defaults={'last_value': last_value})
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS {VENUE_ID_DB_SEQUENCE} START WITH {last_value + 1}')
+
+
+def drop_venue_id_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP SEQUENCE IF EXISTS {VENUE_ID_DB_SEQUENCE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partner', '0004_table_qr_image_default_format'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_venue_id_sequence, drop_venue_id_sequence),
+    ]
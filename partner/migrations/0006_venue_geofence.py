@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partner', '0005_idsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venue',
+            name='geofence_polygon',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='geofence_radius_m',
+            field=models.PositiveIntegerField(default=50),
+        ),
+    ]
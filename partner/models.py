@@ -1,14 +1,42 @@
 from django.apps import apps
-import qrcode
-from io import BytesIO
-from django.core.files.base import ContentFile
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.db.models.fields.files import FieldFile
+import copy
 import uuid
 
-import qrcode
-from io import BytesIO
-from django.core.files import File
-from django.db import models
+from .qr import ensure_qr_image, table_qr_payload, qr_storage_name
+
+
+class IdSequence(models.Model):
+    """
+    Named counter used to hand out human readable ids. On PostgreSQL the
+    value comes from a native sequence, elsewhere the counter row is bumped
+    with a single UPDATE whose row lock serialises concurrent allocations.
+    """
+    VENUE_ID = 'venue_id'
+
+    name = models.CharField(max_length=50, primary_key=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    @staticmethod
+    def db_sequence_name(name):
+        return f'partner_{name}_seq'
+
+    @classmethod
+    def next_value(cls, name):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT nextval(%s)", [cls.db_sequence_name(name)])
+                return cursor.fetchone()[0]
+
+        with transaction.atomic():
+            updated = cls.objects.filter(name=name).update(last_value=F('last_value') + 1)
+            if not updated:
+                cls.objects.get_or_create(name=name)
+                cls.objects.filter(name=name).update(last_value=F('last_value') + 1)
+            return cls.objects.values_list('last_value', flat=True).get(name=name)
+
 
 class Venue(models.Model):
     venue_id = models.CharField(max_length=10, unique=True, editable=False)
@@ -19,6 +47,8 @@ class Venue(models.Model):
     pan_number = models.CharField(max_length=10, null=True, blank=True)
     city = models.CharField(max_length=255)
     geo_location = models.JSONField(null=True)
+    geofence_radius_m = models.PositiveIntegerField(default=50)
+    geofence_polygon = models.JSONField(null=True, blank=True)  # [[lat, lon], ...], takes precedence over the radius
     number_of_tables = models.PositiveIntegerField(default=0)
     total_capacity = models.PositiveIntegerField(default=0)
     current_strength = models.PositiveIntegerField(default=0)
@@ -26,36 +56,67 @@ class Venue(models.Model):
     venue_image = models.ImageField(upload_to='venue_images/', blank=True, null=True)
     qr_code = models.ImageField(upload_to='venue_qrcodes/', blank=True, null=True)
 
+    # Fields the reverse geofence index is built from
+    GEOFENCE_INDEX_FIELDS = {'venue_id', 'name', 'geo_location', 'geofence_radius_m', 'geofence_polygon'}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    def _snapshot_loaded_values(self):
+        # Copied so in-place edits of the geo_location dict still count as changes,
+        # files are tracked by name
+        self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                self._loaded_values[field.attname] = value.name if isinstance(value, FieldFile) else copy.deepcopy(value)
+
+    def get_dirty_fields(self):
+        """
+        Names of the concrete fields changed since the row was loaded, or None
+        when the instance was not loaded from the database.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        ]
+
     def save(self, *args, **kwargs):
-        # Generate venue_id if it's a new venue
+        # Allocate venue_id from the sequence if it's a new venue
         if not self.venue_id:
-            last_venue = Venue.objects.all().order_by('id').last()
-            self.venue_id = f"VEN{(int(last_venue.venue_id.replace('VEN', '')) + 1):03d}" if last_venue else "VEN001"
-        
+            self.venue_id = f"VEN{IdSequence.next_value(IdSequence.VENUE_ID):03d}"
+
         # Generate QR code only for new venues or when venue_id changes
-        if not self.pk or (self.pk and Venue.objects.get(pk=self.pk).venue_id != self.venue_id):
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(self.venue_id)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            buffer = BytesIO()
-            img.save(buffer, format="PNG")
-            
-            # Save the QR code to the qr_code field
-            self.qr_code.save(
-                f'qr_code_{self.venue_id}.png',
-                File(buffer),
-                save=False
-            )
-        
+        loaded = getattr(self, '_loaded_values', None) or {}
+        if self._state.adding or loaded.get('venue_id') != self.venue_id:
+            self.qr_code.name = ensure_qr_image(self.venue_id, upload_to='venue_qrcodes')
+
+        # Loaded venues only write the columns that actually changed
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            dirty_fields = self.get_dirty_fields()
+            if dirty_fields is not None:
+                kwargs['update_fields'] = dirty_fields
+
+        written_fields = kwargs.get('update_fields')
         super().save(*args, **kwargs)
+        self._snapshot_loaded_values()
+
+        # Keep the reverse geofence lookup in step with venue locations
+        if written_fields is None or set(written_fields) & self.GEOFENCE_INDEX_FIELDS:
+            from venueservices.geofence import invalidate_geofence_index
+            invalidate_geofence_index()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from venueservices.geofence import invalidate_geofence_index
+        invalidate_geofence_index()
+        return result
 
     def __str__(self):
         return self.name
@@ -70,35 +131,10 @@ class Table(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.qr_code:
-            self.qr_code = f"{self.venue.venue_id}::{self.table_number}"
-
-        # Generate QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(self.qr_code)  # This encodes the correct format with ::
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        # Prepare file storage
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        
-        # Create clean filename without ::
-        clean_filename = f"qr_{self.venue.venue_id}_{self.table_number}.png"
-        
-        # Set custom upload path: qr_codes/<VenueID>/
-        upload_path = f'{self.venue.venue_id}/{clean_filename}'
-        
-        # Save the image
-        self.qr_image.save(
-            upload_path,
-            ContentFile(buffer.getvalue()),
-            save=False
-        )
+            self.qr_code = table_qr_payload(self.venue, self.table_number)
+
+        # Point at the content-addressed image, it is rendered on first request
+        self.qr_image.name = qr_storage_name(self.qr_code)
 
         super().save(*args, **kwargs)
 
@@ -133,9 +169,26 @@ class Menu(models.Model):
     tag = models.CharField(max_length=20, choices=VENUE_ITEM_TAGS)
     image = models.ImageField(upload_to='menu_images/', blank=True, null=True)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        # Keep the search index in step with the item's searchable fields
+        from .search import index_menu_item
+        index_menu_item(self)
+
     def __str__(self):
         return f"{self.item_name} ({self.get_tag_display()}) - {self.venue.name}"
 
+class MenuSearchToken(models.Model):
+    """One row per (menu item, token) in the cross-venue menu search index."""
+    token = models.CharField(max_length=64, db_index=True)
+    menu_item = models.ForeignKey(Menu, related_name='search_tokens', on_delete=models.CASCADE)
+    venue = models.ForeignKey(Venue, related_name='menu_search_tokens', on_delete=models.CASCADE)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('menu_item', 'token')
+
 class Offer(models.Model):
     OFFER_TYPES = [
         ('FREE_DRINK', 'Free Drink'),
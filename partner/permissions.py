@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from authentication.jwt_auth import invalidate_cached_user
+from authentication.models import CustomUser, Manager, Waiter
+from .models import Venue
+
+OWNER = 'owner'
+MANAGER = 'manager'
+WAITER = 'waiter'
+
+# One letter per role keeps the token's venues claim small, a venue's claim
+# concatenates the letters of every role held there
+ROLE_CLAIM_CODES = {OWNER: 'o', MANAGER: 'm', WAITER: 'w'}
+ROLE_CLAIM_ROLES = {code: role for role, code in ROLE_CLAIM_CODES.items()}
+
+# Staff changes bump the role version the entry is keyed by, the timeout
+# only clears out entries of versions no longer read
+VENUE_ROLES_CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_pk, role_version):
+    # v2 entries map each venue to a set of roles rather than a single one
+    return f'venue_roles:v2:{user_pk}:{role_version}'
+
+
+def load_venue_roles(user_pk):
+    """
+    {venue_id: frozenset of roles} for every venue the user owns or is staff
+    at, read from the primary database, so a lagging replica is never
+    cached. A user can hold several roles at one venue, an owner who is
+    also its manager, and a token for any of them is honoured.
+    """
+    roles = {}
+    owned = Venue.objects.using(DEFAULT_DB_ALIAS).filter(owners__user_id=user_pk)
+    for venue_id in owned.values_list('venue_id', flat=True):
+        roles.setdefault(venue_id, set()).add(OWNER)
+    managed = Manager.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_pk, venue__isnull=False)
+    for venue_id in managed.values_list('venue__venue_id', flat=True):
+        roles.setdefault(venue_id, set()).add(MANAGER)
+    served = Waiter.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_pk, venue__isnull=False)
+    for venue_id in served.values_list('venue__venue_id', flat=True):
+        roles.setdefault(venue_id, set()).add(WAITER)
+    return {venue_id: frozenset(held) for venue_id, held in roles.items()}
+
+
+def venue_roles(user_pk, role_version):
+    """
+    The user's role map at role_version, from the cache when it has one.
+    Read role_version before calling, so a map loaded before a role change
+    committed is only ever stored under the version it replaced.
+    """
+    key = _cache_key(user_pk, role_version)
+    roles = cache.get(key)
+    if roles is None:
+        roles = load_venue_roles(user_pk)
+        cache.set(key, roles, VENUE_ROLES_CACHE_TIMEOUT)
+    return roles
+
+
+def invalidate_venue_roles(*user_pks):
+    """
+    Bumps the users' role versions, which revokes the role claims in tokens
+    already issued to them and moves their role maps to a new cache key, and
+    drops their cached users once the current transaction commits.
+    """
+    CustomUser.objects.filter(pk__in=user_pks).update(role_version=F('role_version') + 1)
+    invalidate_cached_user(*user_pks)
+
+
+def add_venue_role_claims(token, user):
+    """
+    Signs the user's role map and role version into token as the venues and
+    rv claims. Users with more venues than JWT_VENUE_CLAIMS_MAX get no claims
+    and are resolved from the cached role map instead.
+    """
+    # The version first, so the claims are never older than the rv they are signed with
+    user.refresh_from_db(using=DEFAULT_DB_ALIAS, fields=['role_version'])
+    roles = venue_roles(user.pk, user.role_version)
+    if len(roles) > getattr(settings, 'JWT_VENUE_CLAIMS_MAX', 50):
+        return token
+    token['venues'] = {
+        venue_id: ''.join(sorted(ROLE_CLAIM_CODES[role] for role in held))
+        for venue_id, held in roles.items()
+    }
+    token['rv'] = user.role_version
+    return token
+
+
+def _token_venue_roles(request):
+    """The role map signed into the request's token, or None if it has none or it was revoked since."""
+    claims = request.auth.payload.get('venues')
+    version = request.auth.payload.get('rv')
+    if not isinstance(claims, dict) or version is None:
+        return None
+    # request.user is already loaded by the authentication, comparing costs no query
+    if version != getattr(request.user, 'role_version', None):
+        return None
+    return {
+        venue_id: frozenset(ROLE_CLAIM_ROLES[code] for code in codes if code in ROLE_CLAIM_ROLES)
+        for venue_id, codes in claims.items()
+    }
+
+
+def request_venue_roles(request):
+    """
+    The requesting user's role map, resolved at most once per request: from
+    the token's role claims when they are current, else from the cache.
+    """
+    roles = getattr(request, '_venue_roles', None)
+    if roles is None:
+        user_id = request.auth.payload.get('user_id') if request.auth else None
+        if not user_id:
+            roles = {}
+        else:
+            roles = _token_venue_roles(request)
+            if roles is None:
+                roles = venue_roles(user_id, getattr(request.user, 'role_version', 0))
+        request._venue_roles = roles
+    return roles
+
+
+def venue_roles_at(request, venue_id):
+    """The requesting user's roles at venue_id, empty when they hold none."""
+    return request_venue_roles(request).get(venue_id, frozenset())
+
+
+def has_venue_role(request, venue_id, role):
+    """Whether the requesting user holds role at venue_id."""
+    return role in venue_roles_at(request, venue_id)
+
+
+def is_user_associated_with_venue(request, venue):
+    """Whether the user holds the role their token was issued for at venue."""
+    user_type = request.auth.payload.get('user_type') if request.auth else None
+    return user_type is not None and has_venue_role(request, venue.venue_id, user_type)
+
+
+class VenueRoleMixin:
+    """Gives a view the shared is_user_associated_with_venue check."""
+
+    def is_user_associated_with_venue(self, request, venue):
+        return is_user_associated_with_venue(request, venue)
@@ -0,0 +1,247 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import qrcode
+
+QR_BOX_SIZE = 10
+QR_BORDER = 4
+QR_RENDER_VERSION = f'v1:box{QR_BOX_SIZE}:border{QR_BORDER}'
+
+# Batches smaller than this are rendered inline, a pool round trip is not worth it
+PARALLEL_RENDER_THRESHOLD = 8
+
+# Stored images are content-addressed and never rewritten, so a name seen in
+# storage once is remembered instead of being checked again on every read
+QR_EXISTS_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _build_qr(payload):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=QR_BOX_SIZE,
+        border=QR_BORDER,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+
+def make_qr_image(payload):
+    return _build_qr(payload).make_image(fill_color="black", back_color="white")
+
+
+def make_qr_matrix(payload):
+    """Module grid for payload, border included, as rows of booleans (True is dark)."""
+    return _build_qr(payload).get_matrix()
+
+
+def qr_dark_runs(matrix):
+    """Yields (row, start column, length) for each horizontal run of dark modules."""
+    for row_index, row in enumerate(matrix):
+        col = 0
+        while col < len(row):
+            if not row[col]:
+                col += 1
+                continue
+            start = col
+            while col < len(row) and row[col]:
+                col += 1
+            yield row_index, start, col - start
+
+
+def render_qr_png(payload):
+    """Renders a QR code for payload and returns the PNG bytes."""
+    buffer = BytesIO()
+    make_qr_image(payload).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_qr_svg(payload):
+    """
+    Renders a QR code for payload as SVG bytes. Each horizontal run of dark
+    modules becomes one path segment, so no raster image or PNG encoder is
+    involved and the code stays sharp at any print size.
+    """
+    matrix = make_qr_matrix(payload)
+    size = len(matrix)
+    path = ''.join(
+        f'M{start} {row}h{length}v1h-{length}z'
+        for row, start, length in qr_dark_runs(matrix)
+    )
+    # One module maps to box_size pixels, matching the PNG's natural size
+    pixels = size * QR_BOX_SIZE
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/><path d="{path}"/></svg>'
+    ).encode()
+
+
+QR_RENDERERS = {
+    'png': render_qr_png,
+    'svg': render_qr_svg,
+}
+
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def default_qr_format():
+    from django.conf import settings
+    return getattr(settings, 'QR_IMAGE_FORMAT', 'png')
+
+
+def render_qr(payload, fmt=None):
+    return QR_RENDERERS[fmt or default_qr_format()](payload)
+
+
+def _render_workers():
+    from django.conf import settings
+    return getattr(settings, 'QR_RENDER_WORKERS', None) or os.cpu_count() or 1
+
+
+def _get_pool():
+    """
+    Returns the process pool shared by every request in this worker, creating it
+    on first use. Children are spawned rather than forked so they never inherit
+    open database connections or server threads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=_render_workers(),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def render_qr_batch(payloads, fmt=None):
+    """Renders all payloads in fmt, in the process pool when the batch is large enough."""
+    renderer = QR_RENDERERS[fmt or default_qr_format()]
+    payloads = list(payloads)
+    if len(payloads) < PARALLEL_RENDER_THRESHOLD or _render_workers() < 2:
+        return [renderer(payload) for payload in payloads]
+
+    chunksize = max(1, len(payloads) // (_render_workers() * 4))
+    try:
+        return list(_get_pool().map(renderer, payloads, chunksize=chunksize))
+    except BrokenProcessPool:
+        # A crashed child poisons the pool, rebuild it next time and finish inline
+        _reset_pool()
+        return [renderer(payload) for payload in payloads]
+
+
+def table_qr_payload(venue, table_number):
+    return f"{venue.venue_id}::{table_number}"
+
+
+def qr_storage_name(payload, fmt=None, upload_to='qr_codes'):
+    """
+    Content-addressed storage name for a payload's QR image. Bump
+    QR_RENDER_VERSION whenever the rendering parameters change so old images
+    are not served for the new look.
+    """
+    fmt = fmt or default_qr_format()
+    digest = hashlib.sha256(f"{QR_RENDER_VERSION}:{fmt}:{payload}".encode()).hexdigest()
+    return f'{upload_to}/{digest[:2]}/{digest}.{fmt}'
+
+
+def _qr_storage():
+    from django.core.files.storage import default_storage
+    return default_storage
+
+
+def _exists_cache_key(name):
+    return f'qr_exists:{name}'
+
+
+def _remember_stored(names):
+    from django.core.cache import cache
+    cache.set_many({_exists_cache_key(name): True for name in names}, QR_EXISTS_CACHE_TIMEOUT)
+
+
+def stored_qr_names(names):
+    """
+    The subset of storage names that exist in storage. Names already known
+    to exist are answered from the cache, only the rest cost a storage check.
+    """
+    from django.core.cache import cache
+
+    names = set(names)
+    known = cache.get_many([_exists_cache_key(name) for name in names])
+    stored = {name for name in names if _exists_cache_key(name) in known}
+    found = {name for name in names - stored if _qr_storage().exists(name)}
+    if found:
+        _remember_stored(found)
+    return stored | found
+
+
+def ensure_qr_images(payloads, fmt=None, upload_to='qr_codes'):
+    """
+    Makes sure a QR image exists in storage for every payload, rendering only
+    the missing ones (in the process pool for large batches).
+    Returns {payload: storage name}.
+    """
+    from django.core.files.base import ContentFile
+
+    storage = _qr_storage()
+    names = {payload: qr_storage_name(payload, fmt, upload_to) for payload in payloads}
+    stored = stored_qr_names(names.values())
+    missing = [payload for payload, name in names.items() if name not in stored]
+
+    for payload, image in zip(missing, render_qr_batch(missing, fmt)):
+        saved_name = storage.save(names[payload], ContentFile(image))
+        if saved_name != names[payload]:
+            # Another request rendered the same payload first, keep the canonical copy
+            storage.delete(saved_name)
+    if missing:
+        _remember_stored(names[payload] for payload in missing)
+
+    return names
+
+
+def ensure_qr_image(payload, fmt=None, upload_to='qr_codes'):
+    return ensure_qr_images([payload], fmt, upload_to)[payload]
+
+
+def bulk_create_tables(venue, table_numbers):
+    """
+    Creates tables for venue with a single bulk_create. Their QR images are
+    content-addressed and rendered on first request, so no image work
+    happens here.
+    """
+    from .models import Table
+
+    tables = []
+    for number in table_numbers:
+        payload = table_qr_payload(venue, number)
+        tables.append(Table(
+            venue=venue,
+            table_number=number,
+            qr_code=payload,
+            qr_image=qr_storage_name(payload),
+        ))
+
+    if not tables:
+        return []
+    return Table.objects.bulk_create(tables)
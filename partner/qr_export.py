@@ -0,0 +1,181 @@
+import zipfile
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .qr import make_qr_image, make_qr_matrix, qr_dark_runs
+
+# A4 portrait in PDF points, laid out as a 2 x 3 grid of QR cards per page
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+PAGE_MARGIN = 40
+GRID_COLUMNS = 2
+GRID_ROWS = 3
+QR_SIZE = 200
+LABEL_FONT_SIZE = 16
+TITLE_FONT_SIZE = 12
+
+
+class _ChunkBuffer:
+    """Write-only sink that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def render_labelled_qr_png(payload, label):
+    """PNG of the payload's QR code with label printed underneath."""
+    qr_image = make_qr_image(payload).get_image().convert('L')
+    font = ImageFont.load_default(size=28)
+
+    canvas = Image.new('L', (qr_image.width, qr_image.height + 50), 255)
+    canvas.paste(qr_image, (0, 0))
+
+    draw = ImageDraw.Draw(canvas)
+    left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+    draw.text(((canvas.width - (right - left)) / 2, qr_image.height), label, fill=0, font=font)
+
+    buffer = BytesIO()
+    canvas.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def stream_qr_zip(tables):
+    """
+    Yields a zip archive with one labelled PNG per table. tables is an
+    iterable of (table_number, qr_code) pairs, each image is rendered and
+    flushed out before the next one so memory use stays flat.
+    """
+    sink = _ChunkBuffer()
+    # The sink cannot seek, so zipfile streams entries with data descriptors
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for table_number, qr_code in tables:
+            archive.writestr(
+                f'table_{table_number}.png',
+                render_labelled_qr_png(qr_code, f'Table {table_number}'),
+            )
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _pdf_text(text):
+    text = str(text).encode('latin-1', 'replace').decode('latin-1')
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+def _qr_drawing_ops(payload, x, y, size):
+    """PDF path operators drawing the QR code as filled rectangles, one per horizontal run."""
+    matrix = make_qr_matrix(payload)
+    module = size / len(matrix)
+    ops = []
+    for row, start, length in qr_dark_runs(matrix):
+        # PDF y grows upwards, the matrix is top row first
+        row_y = y + size - (row + 1) * module
+        ops.append(f'{x + start * module:.2f} {row_y:.2f} {length * module:.2f} {module:.2f} re')
+    ops.append('f')
+    return ops
+
+
+def _pdf_page_content(title, cards):
+    ops = [
+        'BT', f'/F1 {TITLE_FONT_SIZE} Tf',
+        f'{PAGE_MARGIN} {PAGE_HEIGHT - PAGE_MARGIN} Td', f'{_pdf_text(title)} Tj', 'ET',
+    ]
+
+    cell_width = (PAGE_WIDTH - 2 * PAGE_MARGIN) / GRID_COLUMNS
+    cell_height = (PAGE_HEIGHT - 2 * PAGE_MARGIN - TITLE_FONT_SIZE) / GRID_ROWS
+    for index, (table_number, qr_code) in enumerate(cards):
+        column, row = index % GRID_COLUMNS, index // GRID_COLUMNS
+        cell_x = PAGE_MARGIN + column * cell_width
+        cell_top = PAGE_HEIGHT - PAGE_MARGIN - TITLE_FONT_SIZE - row * cell_height
+
+        qr_x = cell_x + (cell_width - QR_SIZE) / 2
+        qr_y = cell_top - QR_SIZE - 10
+        ops.extend(_qr_drawing_ops(qr_code, qr_x, qr_y, QR_SIZE))
+
+        label = f'Table {table_number}'
+        # Helvetica averages roughly half an em per character, close enough to centre
+        label_x = cell_x + (cell_width - len(label) * LABEL_FONT_SIZE * 0.5) / 2
+        ops.extend([
+            'BT', f'/F1 {LABEL_FONT_SIZE} Tf',
+            f'{label_x:.2f} {qr_y - LABEL_FONT_SIZE - 6:.2f} Td', f'{_pdf_text(label)} Tj', 'ET',
+        ])
+    return '\n'.join(ops).encode('latin-1')
+
+
+def stream_qr_pdf(title, tables):
+    """
+    Yields a printable multi-page PDF with a labelled vector QR code per
+    table. Each page is written out as soon as it is full, and only the byte
+    offsets needed for the cross-reference table are kept.
+    """
+    offset = 0
+    offsets = {}
+
+    def emit(data):
+        nonlocal offset
+        offset += len(data)
+        return data
+
+    def emit_object(number, body):
+        offsets[number] = offset
+        return emit(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+    # Objects 1-3 are the catalog, the page tree (written last, once the kids are known) and the font
+    yield emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    yield emit_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    yield emit_object(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    next_number = 4
+    page_numbers = []
+    cards_per_page = GRID_COLUMNS * GRID_ROWS
+
+    def write_page(cards):
+        nonlocal next_number
+        content_number, page_number = next_number, next_number + 1
+        next_number += 2
+        page_numbers.append(page_number)
+
+        content = _pdf_page_content(title, cards)
+        data = emit_object(
+            content_number,
+            f'<< /Length {len(content)} >>\nstream\n'.encode() + content + b'\nendstream',
+        )
+        data += emit_object(
+            page_number,
+            (
+                f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content_number} 0 R >>'
+            ).encode(),
+        )
+        return data
+
+    cards = []
+    for table in tables:
+        cards.append(table)
+        if len(cards) == cards_per_page:
+            yield write_page(cards)
+            cards = []
+    if cards or not page_numbers:
+        yield write_page(cards)
+
+    kids = ' '.join(f'{number} 0 R' for number in page_numbers)
+    yield emit_object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>'.encode())
+
+    xref_offset = offset
+    xref = [f'xref\n0 {next_number}\n', '0000000000 65535 f \n']
+    xref.extend(f'{offsets[number]:010d} 00000 n \n' for number in range(1, next_number))
+    yield emit(''.join(xref).encode())
+    yield emit(f'trailer\n<< /Size {next_number} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode())
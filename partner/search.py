@@ -0,0 +1,124 @@
+import re
+from django.db.models import Q, Sum
+
+# Matches on the item name count for more than matches on its tag or description
+FIELD_WEIGHTS = {
+    'item_name': 3,
+    'tag': 2,
+    'item_description': 1,
+}
+
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase text and split it into unique alphanumeric tokens, keeping order."""
+    if not text:
+        return []
+
+    tokens = []
+    for token in TOKEN_RE.findall(str(text).lower()):
+        if len(token) < MIN_TOKEN_LENGTH:
+            continue
+        token = token[:MAX_TOKEN_LENGTH]
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def menu_item_tokens(item_name, item_description, tag, tag_choices=None):
+    """
+    Returns {token: weight} for a menu item's searchable fields.
+    A token found in several fields keeps its highest weight.
+    """
+    tag_label = dict(tag_choices or []).get(tag, '')
+    fields = {
+        'item_name': item_name,
+        'item_description': item_description,
+        # "chef_special" is indexed as "chef" and "special" along with its label
+        'tag': f"{tag or ''} {tag_label}".replace('_', ' '),
+    }
+
+    weights = {}
+    for field, text in fields.items():
+        for token in tokenize(text):
+            weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS[field])
+    return weights
+
+
+def index_menu_item(menu_item):
+    """
+    Brings the index rows for one menu item up to date, touching only the
+    tokens that were added, removed or re-weighted since the last save.
+    """
+    from .models import Menu, MenuSearchToken
+
+    wanted = menu_item_tokens(
+        menu_item.item_name,
+        menu_item.item_description,
+        menu_item.tag,
+        Menu.VENUE_ITEM_TAGS,
+    )
+    existing = dict(
+        MenuSearchToken.objects.filter(menu_item=menu_item).values_list('token', 'weight')
+    )
+
+    stale = [token for token in existing if token not in wanted]
+    if stale:
+        MenuSearchToken.objects.filter(menu_item=menu_item, token__in=stale).delete()
+
+    MenuSearchToken.objects.bulk_create([
+        MenuSearchToken(menu_item=menu_item, venue_id=menu_item.venue_id, token=token, weight=weight)
+        for token, weight in wanted.items()
+        if token not in existing
+    ])
+
+    for token, weight in wanted.items():
+        if token in existing and existing[token] != weight:
+            MenuSearchToken.objects.filter(menu_item=menu_item, token=token).update(weight=weight)
+
+
+def search_menu(query, is_veg=None, tag=None, min_price=None, max_price=None, available=True, limit=200):
+    """
+    Looks up menu items across all venues using the token index.
+
+    Items are scored by the summed weight of matching tokens. The last query
+    token is matched as a prefix so partially typed words still hit.
+    Returns a list of (menu_item, score) ordered by descending score.
+    """
+    from .models import Menu, MenuSearchToken
+
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+
+    token_filter = Q(token__in=tokens) | Q(token__startswith=tokens[-1])
+
+    filters = {}
+    if is_veg is not None:
+        filters['menu_item__is_veg'] = is_veg
+    if tag:
+        filters['menu_item__tag'] = tag
+    if min_price is not None:
+        filters['menu_item__price__gte'] = min_price
+    if max_price is not None:
+        filters['menu_item__price__lte'] = max_price
+    if available is not None:
+        filters['menu_item__is_available'] = available
+
+    hits = list(
+        MenuSearchToken.objects.filter(token_filter, **filters)
+        .values('menu_item')
+        .annotate(score=Sum('weight'))
+        .order_by('-score')[:limit]
+    )
+
+    items = Menu.objects.select_related('venue').in_bulk([hit['menu_item'] for hit in hits])
+    return [
+        (items[hit['menu_item']], hit['score'])
+        for hit in hits
+        if hit['menu_item'] in items
+    ]
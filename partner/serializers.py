@@ -6,7 +6,25 @@ from decimal import Decimal, InvalidOperation
 class VenueSerializer(serializers.ModelSerializer):
     class Meta:
         model = Venue
-        fields = ['venue_id', 'name', 'city', 'geo_location', 'number_of_tables', 'venue_image', 'owners', 'category', 'description', 'gst_number', 'pan_number', 'total_capacity', 'current_strength', 'qr_code']
+        fields = ['venue_id', 'name', 'city', 'geo_location', 'geofence_radius_m', 'geofence_polygon', 'number_of_tables', 'venue_image', 'owners', 'category', 'description', 'gst_number', 'pan_number', 'total_capacity', 'current_strength', 'qr_code']
+        # Live presence counter, maintained by venueservices.presence
+        read_only_fields = ['current_strength']
+
+    def validate_geofence_polygon(self, value):
+        if value in (None, []):
+            return None
+        if not isinstance(value, list) or len(value) < 3:
+            raise serializers.ValidationError("A geofence polygon needs at least 3 points.")
+        for point in value:
+            try:
+                if isinstance(point, dict):
+                    float(point['latitude']), float(point['longitude'])
+                else:
+                    lat, lon = point
+                    float(lat), float(lon)
+            except (KeyError, TypeError, ValueError):
+                raise serializers.ValidationError("Each point must be [latitude, longitude].")
+        return value
 
 
 class TableSerializer(serializers.ModelSerializer):
@@ -10,7 +10,9 @@ from .views import (
     CreateOfferAPIView,
     DeactivateOfferAPIView,
     OwnerVenuesAPIView,
-    VenueQRCodesAPIView
+    VenueQRCodesAPIView,
+    TableQRImageAPIView,
+    VenueQRExportAPIView
 )
 
 urlpatterns = [
@@ -19,10 +21,12 @@ urlpatterns = [
     path('venue/<str:venue_id>/menu/add/', AddMenuItemAPIView.as_view(), name='add_menu_item'),
     path('venue/<str:venue_id>/menu/update/', UpdateMenuItemAPIView.as_view(), name='update_menu_item'),
     path('table/<str:qr_code>/occupancy/', UpdateTableOccupancyAPIView.as_view(), name='update_table_occupancy'),
+    path('table/<str:qr_code>/qr_image/', TableQRImageAPIView.as_view(), name='table_qr_image'),
     path('venue/<str:venue_id>/occupancy_stats/', VenueTableStatsAPIView.as_view(), name='venue-stats'),
     path('venue/<str:venue_id>/active_offers/', VenueActiveOffersAPIView.as_view(), name='venue-active-offers'),
     path('venue/<str:venue_id>/create_offer/', CreateOfferAPIView.as_view(), name='create-offer'),
     path('venue/<str:venue_id>/deactivate_offer/', DeactivateOfferAPIView.as_view(), name='deactivate-offer'),
     path('owner_venues/', OwnerVenuesAPIView.as_view(), name='owner-venues'),
     path('venue/<str:venue_id>/qrcodes/', VenueQRCodesAPIView.as_view(), name='venue-qrcodes'),
+    path('venue/<str:venue_id>/qrcodes/export/', VenueQRExportAPIView.as_view(), name='venue-qrcodes-export'),
 ]
@@ -1,18 +1,26 @@
 import os
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import FileResponse
 from rest_framework.views import APIView
+from backend.db_router import ReplicaReadMixin
+from backend.streaming import streaming_response
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Venue, Table, Menu, Offer
-from authentication.models import CustomUser, Manager, Waiter, Owner
+from authentication.models import Owner
 from .serializers import VenueSerializer, TableSerializer, MenuSerializer, OfferSerializer
+from .qr import bulk_create_tables, ensure_qr_images, ensure_qr_image, default_qr_format, qr_storage_name, stored_qr_names, QR_RENDERERS, QR_CONTENT_TYPES
+from .qr_export import stream_qr_pdf, stream_qr_zip
+from .permissions import OWNER, VenueRoleMixin, has_venue_role, invalidate_venue_roles, venue_roles_at
 from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from authentication.jwt_auth import CachedJWTAuthentication
 from rest_framework.exceptions import PermissionDenied, NotFound
 
 class UpdateVenueAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     
 
@@ -31,7 +39,7 @@ class UpdateVenueAPIView(APIView):
         try:
             venue = Venue.objects.get(venue_id=venue_id)
             
-            if not venue.owners.filter(user__id=request.user.id).exists():
+            if not has_venue_role(request, venue.venue_id, OWNER):
                 raise PermissionDenied("You don't own this venue.")
 
             serializer = VenueSerializer(
@@ -50,15 +58,21 @@ class UpdateVenueAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            updated_venue = serializer.save()
+            # Owners are writable here, so owner changes must reach the role maps and token claims
+            with transaction.atomic():
+                owners_before = set(venue.owners.values_list('pk', flat=True))
+                updated_venue = serializer.save()
+                owners_after = set(updated_venue.owners.values_list('pk', flat=True))
+                changed_owners = owners_before ^ owners_after
+                if changed_owners:
+                    invalidate_venue_roles(*changed_owners)
 
             if 'number_of_tables' in request.data:
                 current_tables_count = venue.tables.count()  
                 new_table_count = updated_venue.number_of_tables
                 
                 if new_table_count > current_tables_count:
-                    for i in range(current_tables_count + 1, new_table_count + 1):
-                        Table.objects.create(venue=venue, table_number=i)
+                    bulk_create_tables(venue, range(current_tables_count + 1, new_table_count + 1))
                 elif new_table_count < current_tables_count:
                     venue.tables.filter(table_number__gt=new_table_count).delete()
 
@@ -78,8 +92,8 @@ class UpdateVenueAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class VenueTablesAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+class VenueTablesAPIView(VenueRoleMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_user_type(self, request):
@@ -89,32 +103,6 @@ class VenueTablesAPIView(APIView):
         allowed_types = ['owner', 'manager', 'waiter']
         return user_type in allowed_types
 
-    def is_user_associated_with_venue(self, request, venue):
-        user_id = request.auth.payload.get('user_id')
-        
-        if not user_id:
-            return False
-            
-        try:
-            custom_user = CustomUser.objects.get(id=user_id)
-            user_type = self.get_user_type(request)
-            
-            if user_type == 'owner':
-                # Check if the user is an owner of this venue
-                return venue.owners.filter(user=custom_user).exists()
-            
-            elif user_type == 'manager':
-                # Check if the user is a manager assigned to this venue
-                return Manager.objects.filter(user=custom_user, venue=venue).exists()
-                
-            elif user_type == 'waiter':
-                # Check if the user is a waiter assigned to this venue
-                return Waiter.objects.filter(user=custom_user, venue=venue).exists()
-                
-            return False
-        except CustomUser.DoesNotExist:
-            return False
-
     def get(self, request, venue_id, *args, **kwargs):
         try:
             user_type = self.get_user_type(request)
@@ -132,6 +120,10 @@ class VenueTablesAPIView(APIView):
                 }, status=status.HTTP_403_FORBIDDEN)
 
             tables = venue.tables.all()
+
+            # Render any QR images that have not been requested before
+            ensure_qr_images([table.qr_code for table in tables])
+
             serializer = TableSerializer(tables, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
             
@@ -184,8 +176,8 @@ class VenueTablesAPIView(APIView):
                 "message": "Venue not found."
             }, status=status.HTTP_404_NOT_FOUND)
 
-class AddMenuItemAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+class AddMenuItemAPIView(VenueRoleMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_user_type(self, request):
@@ -194,27 +186,6 @@ class AddMenuItemAPIView(APIView):
     def check_user_permission(self, user_type):
         return user_type in ['owner', 'manager']
 
-    def is_user_associated_with_venue(self, request, venue):
-        user_id = request.auth.payload.get('user_id')
-        
-        if not user_id:
-            return False
-            
-        try:
-            custom_user = CustomUser.objects.get(id=user_id)
-            
-            if request.auth.payload.get('user_type') == 'owner':
-                # Check if the user is an owner of this venue
-                return venue.owners.filter(user=custom_user).exists()
-            
-            elif request.auth.payload.get('user_type') == 'manager':
-                # Check if the user is a manager assigned to this venue
-                return Manager.objects.filter(user=custom_user, venue=venue).exists()
-                
-            return False
-        except CustomUser.DoesNotExist:
-            return False
-
     def post(self, request, venue_id, *args, **kwargs):
         try:
             user_type = self.get_user_type(request)
@@ -251,8 +222,8 @@ class AddMenuItemAPIView(APIView):
                 "message": "Venue not found."
             }, status=status.HTTP_404_NOT_FOUND)
         
-class UpdateMenuItemAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+class UpdateMenuItemAPIView(VenueRoleMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_user_type(self, request):
@@ -262,28 +233,6 @@ class UpdateMenuItemAPIView(APIView):
         # Only allow owners and managers to update menu items
         return user_type in ['owner', 'manager']
 
-    def is_user_associated_with_venue(self, request, venue):
-        user_id = request.auth.payload.get('user_id')
-        
-        if not user_id:
-            return False
-            
-        try:
-            custom_user = CustomUser.objects.get(id=user_id)
-            user_type = self.get_user_type(request)
-            
-            if user_type == 'owner':
-                # Check if the user is an owner of this venue
-                return venue.owners.filter(user=custom_user).exists()
-            
-            elif user_type == 'manager':
-                # Check if the user is a manager assigned to this venue
-                return Manager.objects.filter(user=custom_user, venue=venue).exists()
-                
-            return False
-        except CustomUser.DoesNotExist:
-            return False
-
     def patch(self, request, venue_id, *args, **kwargs):
         try:
             # Check user permissions
@@ -338,7 +287,7 @@ class UpdateMenuItemAPIView(APIView):
             )
 
 class UpdateTableOccupancyAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def put(self, request, qr_code, *args, **kwargs):
@@ -352,7 +301,7 @@ class UpdateTableOccupancyAPIView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             table.is_occupied = is_occupied
-            table.save()
+            table.save(update_fields=['is_occupied'])
             
             return Response({
                 "message": "Table occupancy updated successfully.",
@@ -365,8 +314,8 @@ class UpdateTableOccupancyAPIView(APIView):
                 "message": "Table not found."
             }, status=status.HTTP_404_NOT_FOUND)
 
-class VenueTableStatsAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+class VenueTableStatsAPIView(ReplicaReadMixin, VenueRoleMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_user_type(self, request):
@@ -376,26 +325,6 @@ class VenueTableStatsAPIView(APIView):
         allowed_types = ['owner', 'manager', 'waiter']
         return user_type in allowed_types
 
-    def is_user_associated_with_venue(self, request, venue):
-        user_id = request.auth.payload.get('user_id')
-        
-        if not user_id:
-            return False
-            
-        try:
-            custom_user = CustomUser.objects.get(id=user_id)
-            user_type = self.get_user_type(request)
-            
-            if user_type == 'owner':
-                return venue.owners.filter(user=custom_user).exists()
-            elif user_type == 'manager':
-                return Manager.objects.filter(user=custom_user, venue=venue).exists()
-            elif user_type == 'waiter':
-                return Waiter.objects.filter(user=custom_user, venue=venue).exists()
-            return False
-        except CustomUser.DoesNotExist:
-            return False
-
     def get(self, request, venue_id, *args, **kwargs):
         try:
             # Check user permissions
@@ -441,8 +370,8 @@ class VenueTableStatsAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-class VenueActiveOffersAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+class VenueActiveOffersAPIView(ReplicaReadMixin, VenueRoleMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_user_type(self, request):
@@ -452,26 +381,6 @@ class VenueActiveOffersAPIView(APIView):
         allowed_types = ['owner', 'manager', 'waiter']
         return user_type in allowed_types
 
-    def is_user_associated_with_venue(self, request, venue):
-        user_id = request.auth.payload.get('user_id')
-        
-        if not user_id:
-            return False
-            
-        try:
-            custom_user = CustomUser.objects.get(id=user_id)
-            user_type = self.get_user_type(request)
-            
-            if user_type == 'owner':
-                return venue.owners.filter(user=custom_user).exists()
-            elif user_type == 'manager':
-                return Manager.objects.filter(user=custom_user, venue=venue).exists()
-            elif user_type == 'waiter':
-                return Waiter.objects.filter(user=custom_user, venue=venue).exists()
-            return False
-        except CustomUser.DoesNotExist:
-            return False
-
     def get(self, request, venue_id, *args, **kwargs):
         try:
             # Check user permissions
@@ -513,8 +422,8 @@ class VenueActiveOffersAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-class CreateOfferAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+class CreateOfferAPIView(VenueRoleMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_user_type(self, request):
@@ -524,28 +433,6 @@ class CreateOfferAPIView(APIView):
         # Only allow owners and managers to create offers
         return user_type in ['owner', 'manager']
 
-    def is_user_associated_with_venue(self, request, venue):
-        user_id = request.auth.payload.get('user_id')
-        
-        if not user_id:
-            return False
-            
-        try:
-            custom_user = CustomUser.objects.get(id=user_id)
-            user_type = self.get_user_type(request)
-            
-            if user_type == 'owner':
-                # Check if the user is an owner of this venue
-                return venue.owners.filter(user=custom_user).exists()
-            
-            elif user_type == 'manager':
-                # Check if the user is a manager assigned to this venue
-                return Manager.objects.filter(user=custom_user, venue=venue).exists()
-                
-            return False
-        except CustomUser.DoesNotExist:
-            return False
-
     def post(self, request, venue_id, *args, **kwargs):
         try:
             # Check user permissions
@@ -592,8 +479,8 @@ class CreateOfferAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-class DeactivateOfferAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+class DeactivateOfferAPIView(VenueRoleMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_user_type(self, request):
@@ -603,28 +490,6 @@ class DeactivateOfferAPIView(APIView):
         # Only allow owners and managers to deactivate offers
         return user_type in ['owner', 'manager']
 
-    def is_user_associated_with_venue(self, request, venue):
-        user_id = request.auth.payload.get('user_id')
-        
-        if not user_id:
-            return False
-            
-        try:
-            custom_user = CustomUser.objects.get(id=user_id)
-            user_type = self.get_user_type(request)
-            
-            if user_type == 'owner':
-                # Check if the user is an owner of this venue
-                return venue.owners.filter(user=custom_user).exists()
-            
-            elif user_type == 'manager':
-                # Check if the user is a manager assigned to this venue
-                return Manager.objects.filter(user=custom_user, venue=venue).exists()
-                
-            return False
-        except CustomUser.DoesNotExist:
-            return False
-
     def patch(self, request, venue_id, *args, **kwargs):
         try:
             # Check user permissions
@@ -668,8 +533,8 @@ class DeactivateOfferAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class OwnerVenuesAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+class OwnerVenuesAPIView(ReplicaReadMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
@@ -697,8 +562,9 @@ class OwnerVenuesAPIView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 class VenueQRCodesAPIView(APIView):
-    authentication_classes = []
-    permission_classes = []
+    # Stored images are public, only staff of the venue can have missing ones rendered
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [AllowAny]
 
     def get(self, request, venue_id):
         try:
@@ -712,22 +578,124 @@ class VenueQRCodesAPIView(APIView):
         # Debugging: Print the venue ID being searched
         print(f"Searching for venue: {venue_id}")
 
+        # 'svg' or 'png', defaults to the storage format
+        qr_format = request.query_params.get('qr_format', default_qr_format()).lower()
+        if qr_format not in QR_RENDERERS:
+            return Response(
+                {"error": f"qr_format must be one of: {', '.join(QR_RENDERERS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        tables = list(venue.tables.all().order_by('table_number'))
+        payloads = [table.qr_code for table in tables]
+
+        if request.user.is_authenticated and venue_roles_at(request, venue.venue_id):
+            # QR images are rendered on first request and reused afterwards
+            qr_names = ensure_qr_images(payloads, qr_format)
+            venue_qr_name = ensure_qr_image(venue.venue_id, qr_format, upload_to='venue_qrcodes')
+        else:
+            qr_names = {payload: qr_storage_name(payload, qr_format) for payload in payloads}
+            venue_qr_name = qr_storage_name(venue.venue_id, qr_format, upload_to='venue_qrcodes')
+            stored = stored_qr_names([*qr_names.values(), venue_qr_name])
+            if not stored:
+                return Response(
+                    {"error": "QR images have not been generated yet."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            # Images that were never rendered are listed without a URL
+            qr_names = {payload: name if name in stored else None for payload, name in qr_names.items()}
+            venue_qr_name = venue_qr_name if venue_qr_name in stored else None
+
+        def qr_url(name):
+            return request.build_absolute_uri(default_storage.url(name)) if name else None
+
         # Build response data
         response_data = {
             "venue_info": {
                 "id": venue.venue_id,
                 "name": venue.name,
-                "qr_code_url": request.build_absolute_uri(venue.qr_code.url) if venue.qr_code else None
+                "qr_code_url": qr_url(venue_qr_name),
+                "qr_format": qr_format
             },
             "tables": [
                 {
                     "table_number": table.table_number,
-                    "qr_code_url": request.build_absolute_uri(table.qr_image.url) if table.qr_image else None,
+                    "qr_code_url": qr_url(qr_names[table.qr_code]),
                     "is_occupied": table.is_occupied,
                     "qr_data": table.qr_code  # The VEN001::1 format
                 }
-                for table in venue.tables.all().order_by('table_number')
+                for table in tables
             ]
         }
 
-        return Response(response_data)
\ No newline at end of file
+        return Response(response_data)
+
+class TableQRImageAPIView(APIView):
+    # Stored images are public, only staff of the table's venue can have a missing one rendered
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [AllowAny]
+
+    def get(self, request, qr_code):
+        venue_id = Table.objects.filter(qr_code=qr_code).values_list('venue__venue_id', flat=True).first()
+        if venue_id is None:
+            return Response(
+                {"error": "Table not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        qr_format = request.query_params.get('qr_format', default_qr_format()).lower()
+        if qr_format not in QR_RENDERERS:
+            return Response(
+                {"error": f"qr_format must be one of: {', '.join(QR_RENDERERS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        name = qr_storage_name(qr_code, qr_format)
+        if not default_storage.exists(name):
+            if not request.user.is_authenticated or not venue_roles_at(request, venue_id):
+                return Response(
+                    {"error": "QR image has not been generated yet."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            name = ensure_qr_image(qr_code, qr_format)
+        response = FileResponse(default_storage.open(name, 'rb'), content_type=QR_CONTENT_TYPES[qr_format])
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+class VenueQRExportAPIView(VenueRoleMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, venue_id):
+        try:
+            venue = Venue.objects.get(venue_id=venue_id)
+        except Venue.DoesNotExist:
+            return Response(
+                {"error": f"Venue with ID {venue_id} not found", "received_venue_id": venue_id},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Every export renders a code per table, so it is limited to the venue's staff
+        if not self.is_user_associated_with_venue(request, venue):
+            return Response({
+                "message": "You are not associated with this venue."
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        export_format = request.query_params.get('file_type', 'pdf').lower()
+        if export_format not in ['pdf', 'zip']:
+            return Response(
+                {"error": "file_type must be either 'pdf' or 'zip'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Tables are read lazily so a large venue is never held in memory at once
+        tables = venue.tables.order_by('table_number').values_list('table_number', 'qr_code').iterator()
+
+        if export_format == 'zip':
+            response = streaming_response(request, stream_qr_zip(tables), content_type='application/zip')
+        else:
+            title = f"{venue.name} ({venue.venue_id})"
+            response = streaming_response(request, stream_qr_pdf(title, tables), content_type='application/pdf')
+
+        response['Content-Disposition'] = f'attachment; filename="{venue.venue_id}_qrcodes.{export_format}"'
+        return response
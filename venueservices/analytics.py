@@ -0,0 +1,142 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from partner.models import Menu
+from .models import Booking, CartItem
+
+# Days are invalidated when a booking on them ends, the timeout is only a safety net
+ITEM_SALES_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def _day_key(venue_pk, day):
+    return f'item_sales:{venue_pk}:{day.isoformat()}'
+
+
+def invalidate_item_sales(venue_pk, day):
+    cache.delete(_day_key(venue_pk, day))
+
+
+def _compute_days(venue_pk, days):
+    """
+    Per-day item and tag aggregates for completed bookings, computed in SQL
+    with three grouped queries however many days are asked for.
+    """
+    start, end = min(days), max(days)
+    wanted = set(days)
+    result = {day: {'bookings': 0, 'items': {}, 'tags': {}} for day in days}
+
+    bookings = (
+        Booking.objects.filter(venue_id=venue_pk, is_ongoing=False, date__gte=start, date__lte=end)
+        .values('date')
+        .annotate(total=Count('booking_id'))
+        .order_by()
+    )
+    for row in bookings:
+        if row['date'] in wanted:
+            result[row['date']]['bookings'] = row['total']
+
+    cart_items = CartItem.objects.filter(
+        cart__booking__venue_id=venue_pk,
+        cart__booking__is_ongoing=False,
+        cart__booking__date__gte=start,
+        cart__booking__date__lte=end,
+    )
+    totals = {
+        'quantity': Sum('quantity'),
+        'revenue': Sum('total_price'),
+        'bookings': Count('cart__booking', distinct=True),
+    }
+
+    items = (
+        cart_items.values('cart__booking__date', 'menu_item_id', 'menu_item__item_name', 'menu_item__tag')
+        .annotate(**totals)
+        .order_by()
+    )
+    for row in items:
+        day = row['cart__booking__date']
+        if day in wanted:
+            result[day]['items'][str(row['menu_item_id'])] = (
+                row['menu_item__item_name'], row['menu_item__tag'],
+                row['quantity'] or 0, row['revenue'] or Decimal('0'), row['bookings'],
+            )
+
+    tags = cart_items.values('cart__booking__date', 'menu_item__tag').annotate(**totals).order_by()
+    for row in tags:
+        day = row['cart__booking__date']
+        if day in wanted:
+            result[day]['tags'][row['menu_item__tag']] = (
+                row['quantity'] or 0, row['revenue'] or Decimal('0'), row['bookings'],
+            )
+
+    return result
+
+
+def _daily_aggregates(venue_pk, start, end):
+    """Per-day aggregates for [start, end], read from the cache with one round trip and filled in bulk."""
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    keys = {_day_key(venue_pk, day): day for day in days}
+
+    cached = cache.get_many(keys)
+    daily = {keys[key]: value for key, value in cached.items()}
+
+    missing = [day for day in days if day not in daily]
+    if missing:
+        computed = _compute_days(venue_pk, missing)
+        cache.set_many(
+            {_day_key(venue_pk, day): value for day, value in computed.items()},
+            ITEM_SALES_CACHE_TIMEOUT,
+        )
+        daily.update(computed)
+    return daily
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+def item_sales_report(venue, start, end, limit=10):
+    """
+    Top items, revenue by tag and attach rates (the share of completed
+    bookings that ordered the item or tag) for bookings dated in [start, end].
+    """
+    total_bookings = 0
+    items = {}
+    tags = {}
+    for day_data in _daily_aggregates(venue.pk, start, end).values():
+        total_bookings += day_data['bookings']
+        for menu_item_id, (name, tag, quantity, revenue, bookings) in day_data['items'].items():
+            entry = items.setdefault(menu_item_id, {'name': name, 'tag': tag, 'quantity': 0, 'revenue': Decimal('0'), 'bookings': 0})
+            entry['quantity'] += quantity
+            entry['revenue'] += revenue
+            entry['bookings'] += bookings
+        for tag, (quantity, revenue, bookings) in day_data['tags'].items():
+            entry = tags.setdefault(tag, {'quantity': 0, 'revenue': Decimal('0'), 'bookings': 0})
+            entry['quantity'] += quantity
+            entry['revenue'] += revenue
+            entry['bookings'] += bookings
+
+    tag_labels = dict(Menu.VENUE_ITEM_TAGS)
+    top_items = sorted(items.items(), key=lambda item: (-item[1]['revenue'], -item[1]['quantity']))[:limit]
+
+    return {
+        'total_bookings': total_bookings,
+        'total_item_revenue': float(sum((entry['revenue'] for entry in tags.values()), Decimal('0'))),
+        'top_items': [{
+            'menu_item_id': menu_item_id,
+            'item_name': entry['name'],
+            'tag': entry['tag'],
+            'quantity': entry['quantity'],
+            'revenue': float(entry['revenue']),
+            'attach_rate': _rate(entry['bookings'], total_bookings),
+        } for menu_item_id, entry in top_items],
+        'by_tag': [{
+            'tag': tag,
+            'label': tag_labels.get(tag, tag),
+            'quantity': entry['quantity'],
+            'revenue': float(entry['revenue']),
+            'attach_rate': _rate(entry['bookings'], total_bookings),
+        } for tag, entry in sorted(tags.items(), key=lambda item: -item[1]['revenue'])],
+    }
@@ -0,0 +1,192 @@
+import asyncio
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
+
+from partner.models import Venue
+from .geofence import auto_check_in, check_active_presences, distance_m
+from .presence import check_in, check_out, heartbeat_timeout, touch_presences
+
+# Close code sent when the client stops heartbeating
+HEARTBEAT_TIMEOUT_CLOSE_CODE = 4008
+
+
+class PresenceConsumer(AsyncWebsocketConsumer):
+    """
+    One connection per checked-in customer. The client sends small heartbeat
+    frames, optionally with its location, and the server runs check-in,
+    geofence exits and the checkout on a missed heartbeat.
+
+    Frames from the client:
+        {"type": "check_in", "venue_id": "VEN001"}
+        {"type": "heartbeat", "latitude": 12.97, "longitude": 77.59, "auto_check_in": true}
+        {"type": "check_out", "venue_id": "VEN001"}  (venue_id optional)
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        token = self.scope.get('token_payload') or {}
+
+        if self.user == AnonymousUser() or token.get('user_type') != 'customuser':
+            await self.close()
+            return
+
+        self.timeout = heartbeat_timeout()
+        # last_seen is written at most this often, heartbeats in between stay in memory
+        self.touch_interval = self.timeout / 3
+        self.last_heartbeat = self.last_touch = timezone.now()
+        self.last_location = None
+        self.watchdog = None
+
+        await self.accept()
+        await self.send_json({
+            'type': 'presence_config',
+            'heartbeat_interval': self.touch_interval,
+            'timeout': self.timeout,
+        })
+        self.watchdog = asyncio.ensure_future(self.watch_heartbeats())
+
+    async def disconnect(self, close_code):
+        watchdog = getattr(self, 'watchdog', None)
+        if watchdog is not None:
+            watchdog.cancel()
+            # Leave the open presences to expire_stale_presences, a dropped
+            # connection that comes back within the timeout keeps its check-in
+            await self.touch(self.last_heartbeat)
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content, default=str))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = json.loads(text_data or '')
+        except ValueError:
+            await self.send_json({'type': 'error', 'detail': 'Frames must be JSON.'})
+            return
+
+        message_type = data.get('type')
+        if message_type == 'heartbeat':
+            await self.heartbeat(data)
+        elif message_type == 'check_in':
+            await self.check_in(data)
+        elif message_type == 'check_out':
+            await self.check_out(data)
+        else:
+            await self.send_json({'type': 'error', 'detail': f'Unknown frame type: {message_type}'})
+
+    async def heartbeat(self, data):
+        now = timezone.now()
+        self.last_heartbeat = now
+
+        exits = []
+        checked_in = None
+        location = self.parse_location(data)
+        if location and self.has_moved(location):
+            self.last_location = location
+            exits = await self.evaluate_geofences(location, now)
+            if data.get('auto_check_in'):
+                checked_in = await self.auto_check_in(location)
+            self.last_touch = now
+        elif (now - self.last_touch).total_seconds() >= self.touch_interval:
+            await self.touch(now)
+            self.last_touch = now
+
+        response = {'type': 'heartbeat_ack'}
+        if exits:
+            response['checked_out'] = exits
+        if checked_in:
+            response['checked_in'] = checked_in
+        await self.send_json(response)
+
+    async def check_in(self, data):
+        venue = await self.get_venue(data.get('venue_id'))
+        if venue is None:
+            await self.send_json({'type': 'error', 'detail': 'Venue not found.'})
+            return
+
+        presence, created = await database_sync_to_async(check_in)(
+            self.user, venue, track_heartbeats=True
+        )
+        self.last_heartbeat = self.last_touch = timezone.now()
+        await self.send_json({
+            'type': 'checked_in',
+            'presence_id': str(presence.id),
+            'venue_id': venue.venue_id,
+            'venue_name': venue.name,
+            'created': created,
+        })
+
+    async def check_out(self, data):
+        venue = None
+        if data.get('venue_id'):
+            venue = await self.get_venue(data['venue_id'])
+            if venue is None:
+                await self.send_json({'type': 'error', 'detail': 'Venue not found.'})
+                return
+
+        closed = await database_sync_to_async(check_out)(self.user, venue)
+        await self.send_json({'type': 'checked_out', 'closed': closed})
+
+    async def watch_heartbeats(self):
+        """Checks the user out and drops the connection once heartbeats stop arriving."""
+        while True:
+            idle = (timezone.now() - self.last_heartbeat).total_seconds()
+            if idle >= self.timeout:
+                break
+            await asyncio.sleep(self.timeout - idle)
+
+        await database_sync_to_async(check_out)(self.user, None, self.last_heartbeat)
+        self.watchdog = None
+        await self.send_json({'type': 'heartbeat_timeout'})
+        await self.close(code=HEARTBEAT_TIMEOUT_CLOSE_CODE)
+
+    def parse_location(self, data):
+        try:
+            return (float(data['latitude']), float(data['longitude']))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def has_moved(self, location):
+        if self.last_location is None:
+            return True
+        min_move_m = getattr(settings, 'LOCATION_PING_MIN_MOVE_M', 15)
+        return distance_m(*self.last_location, *location) >= min_move_m
+
+    @database_sync_to_async
+    def get_venue(self, venue_id):
+        if not venue_id:
+            return None
+        return Venue.objects.filter(venue_id=venue_id).only('id', 'venue_id', 'name').first()
+
+    @database_sync_to_async
+    def touch(self, now):
+        touch_presences(self.user, now)
+
+    @database_sync_to_async
+    def auto_check_in(self, location):
+        result = auto_check_in(self.user, location[0], location[1], track_heartbeats=True)
+        if result is None:
+            return None
+        venue, presence, created = result
+        if not created:
+            return None
+        return {
+            'presence_id': str(presence.id),
+            'venue_id': venue.venue_id,
+            'venue_name': venue.name,
+        }
+
+    @database_sync_to_async
+    def evaluate_geofences(self, location, now):
+        touch_presences(self.user, now)
+        checked = check_active_presences(self.user, location[0], location[1], now)
+        return [{
+            'presence_id': str(presence.id),
+            'venue_id': presence.venue.venue_id,
+            'venue_name': presence.venue.name,
+            'distance_meters': round(distance, 1) if distance is not None else None,
+        } for presence, inside, distance in checked if not inside]
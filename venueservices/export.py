@@ -0,0 +1,165 @@
+import base64
+import csv
+import json
+import uuid
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from .models import Booking, CartItem
+
+# Bookings read per round trip, their cart items are fetched in one query per chunk
+EXPORT_CHUNK_SIZE = 500
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+CSV_COLUMNS = [
+    'record_type', 'cursor', 'booking_id', 'date', 'table_number',
+    'item_name', 'tag', 'quantity', 'unit_price', 'line_total', 'booking_total',
+]
+
+
+class _Echo:
+    """Pseudo file for csv.writer that returns each written line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def encode_cursor(booking_date, booking_id):
+    raw = f'{booking_date.isoformat()}:{booking_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(date, booking_id) of the last booking a client received. Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        booking_date, booking_id = raw.split(':', 1)
+        parsed = parse_date(booking_date)
+        if parsed is None:
+            raise ValueError
+        return parsed, uuid.UUID(booking_id)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid export cursor.')
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_ledger(venue, start, end, after=None, chunk_size=EXPORT_CHUNK_SIZE, using=None):
+    """
+    Yields (booking, items) for the completed bookings of venue dated in
+    [start, end], ordered by (date, booking_id) so the export can be resumed
+    after any booking. Bookings are read from a server-side cursor where the
+    database supports it, and items are fetched one chunk of bookings at a
+    time, so memory use does not grow with the range. using picks the
+    database, the router's choice when not given.
+    """
+    bookings = Booking.objects.using(using).filter(venue=venue, is_ongoing=False, date__gte=start, date__lte=end)
+    if after is not None:
+        after_date, after_id = after
+        bookings = bookings.filter(Q(date__gt=after_date) | Q(date=after_date, booking_id__gt=after_id))
+    rows = (
+        bookings.order_by('date', 'booking_id')
+        .values('booking_id', 'date', 'table__table_number', 'total_bill')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    for chunk in _chunks(rows, chunk_size):
+        items = {}
+        for item in (
+            CartItem.objects.using(using).filter(cart__booking_id__in=[booking['booking_id'] for booking in chunk])
+            .order_by('cart__booking_id', 'menu_item__item_name', 'cart_item_id')
+            .values('cart__booking_id', 'menu_item__item_name', 'menu_item__tag', 'quantity', 'total_price')
+        ):
+            items.setdefault(item['cart__booking_id'], []).append(item)
+        for booking in chunk:
+            yield booking, items.get(booking['booking_id'], [])
+
+
+def _unit_price(item):
+    if not item['quantity']:
+        return item['total_price']
+    return (item['total_price'] / item['quantity']).quantize(Decimal('0.01'))
+
+
+def stream_ledger_csv(ledger):
+    """
+    Yields the ledger as CSV, one chunk per booking: an item row per cart
+    item followed by a booking row carrying its total and the resume cursor.
+    A final total row has the number of bookings streamed in the quantity
+    column and their summed bills.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+
+    bookings_count = 0
+    grand_total = Decimal('0')
+    for booking, items in ledger:
+        booking_id = str(booking['booking_id'])
+        lines = [
+            writer.writerow([
+                'item', '', booking_id, booking['date'], booking['table__table_number'],
+                item['menu_item__item_name'], item['menu_item__tag'], item['quantity'],
+                _unit_price(item), item['total_price'], '',
+            ])
+            for item in items
+        ]
+        lines.append(writer.writerow([
+            'booking', encode_cursor(booking['date'], booking['booking_id']), booking_id,
+            booking['date'], booking['table__table_number'], '', '', '', '', '', booking['total_bill'],
+        ]))
+        bookings_count += 1
+        grand_total += booking['total_bill']
+        yield ''.join(lines)
+
+    yield writer.writerow(['total', '', '', '', '', '', '', bookings_count, '', '', grand_total])
+
+
+def stream_ledger_jsonl(ledger):
+    """Yields the ledger as JSON lines, one booking with its items per line and a summary line last."""
+    bookings_count = 0
+    grand_total = Decimal('0')
+    for booking, items in ledger:
+        bookings_count += 1
+        grand_total += booking['total_bill']
+        yield json.dumps({
+            'type': 'booking',
+            'cursor': encode_cursor(booking['date'], booking['booking_id']),
+            'booking_id': str(booking['booking_id']),
+            'date': booking['date'].isoformat(),
+            'table_number': booking['table__table_number'],
+            'total_bill': str(booking['total_bill']),
+            'items': [{
+                'item_name': item['menu_item__item_name'],
+                'tag': item['menu_item__tag'],
+                'quantity': item['quantity'],
+                'unit_price': str(_unit_price(item)),
+                'line_total': str(item['total_price']),
+            } for item in items],
+        }) + '\n'
+
+    yield json.dumps({
+        'type': 'summary',
+        'bookings_count': bookings_count,
+        'total_sales': str(grand_total),
+    }) + '\n'
+
+
+EXPORT_STREAMS = {
+    'csv': stream_ledger_csv,
+    'jsonl': stream_ledger_jsonl,
+}
@@ -0,0 +1,295 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from partner.models import Venue
+from .models import Presence
+from .presence import check_in, close_presence_objects, close_presences
+from .utils import get_venue_geo
+
+EARTH_RADIUS_M = 6371000
+
+# Used for venues that have neither a radius nor a polygon configured
+DEFAULT_GEOFENCE_RADIUS_M = 50
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _polygon_points(polygon):
+    """Normalises a stored polygon to [(lat, lon), ...], accepting pairs or latitude/longitude dicts."""
+    points = []
+    for point in polygon or []:
+        if isinstance(point, dict):
+            points.append((float(point['latitude']), float(point['longitude'])))
+        else:
+            points.append((float(point[0]), float(point[1])))
+    return points
+
+
+def point_in_polygon(lat, lon, points):
+    """Ray casting test, good enough for venue sized polygons."""
+    inside = False
+    j = len(points) - 1
+    for i in range(len(points)):
+        lat_i, lon_i = points[i]
+        lat_j, lon_j = points[j]
+        if (lon_i > lon) != (lon_j > lon):
+            crossing_lat = lat_i + (lon - lon_i) * (lat_j - lat_i) / (lon_j - lon_i)
+            if lat < crossing_lat:
+                inside = not inside
+        j = i
+    return inside
+
+
+class Geofence:
+    """A venue's fence, either a polygon or a radius in metres around its geo_location."""
+
+    def __init__(self, venue):
+        self.venue = venue
+        self.latitude, self.longitude = get_venue_geo(venue)
+        self.radius_m = venue.geofence_radius_m or DEFAULT_GEOFENCE_RADIUS_M
+        self.polygon = _polygon_points(venue.geofence_polygon) if venue.geofence_polygon else None
+
+    @property
+    def is_configured(self):
+        return bool(self.polygon) or (self.latitude is not None and self.longitude is not None)
+
+    def bounding_box(self):
+        """(min_lat, min_lon, max_lat, max_lon) enclosing the fence."""
+        if self.polygon:
+            lats = [lat for lat, lon in self.polygon]
+            lons = [lon for lat, lon in self.polygon]
+            return min(lats), min(lons), max(lats), max(lons)
+
+        lat, lon = float(self.latitude), float(self.longitude)
+        d_lat = math.degrees(self.radius_m / EARTH_RADIUS_M)
+        d_lon = d_lat / max(math.cos(math.radians(lat)), 1e-6)
+        return lat - d_lat, lon - d_lon, lat + d_lat, lon + d_lon
+
+
+def evaluate_geofences(lat, lon, fences):
+    """
+    Evaluates one location against many fences in a single pass, the trig for
+    the user's point is computed once and shared by every radius check.
+    Returns [(fence, inside, distance in metres or None)], fences without a
+    location are reported as inside so they are never closed by accident.
+    """
+    phi = math.radians(lat)
+    cos_phi = math.cos(phi)
+
+    results = []
+    for fence in fences:
+        if not fence.is_configured:
+            results.append((fence, True, None))
+            continue
+
+        distance = None
+        if fence.latitude is not None and fence.longitude is not None:
+            venue_phi = math.radians(float(fence.latitude))
+            d_phi = venue_phi - phi
+            d_lambda = math.radians(float(fence.longitude) - lon)
+            a = math.sin(d_phi / 2) ** 2 + cos_phi * math.cos(venue_phi) * math.sin(d_lambda / 2) ** 2
+            distance = 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+        if fence.polygon:
+            inside = point_in_polygon(lat, lon, fence.polygon)
+        else:
+            inside = distance <= fence.radius_m
+        results.append((fence, inside, distance))
+    return results
+
+
+class GeofenceIndex:
+    """
+    Uniform lat/lon grid over venue fences for reverse lookups. Each fence is
+    filed under every cell its bounding box touches, so a lookup only runs
+    the exact test on the handful of fences sharing the point's cell.
+    """
+
+    def __init__(self, fences, cell_degrees=None):
+        self.cell_degrees = cell_degrees or getattr(settings, 'GEOFENCE_INDEX_CELL_DEGREES', 0.01)
+        self.cells = {}
+        self.size = 0
+        for fence in fences:
+            if not fence.is_configured:
+                continue
+            if fence.latitude is not None and fence.longitude is not None:
+                fence.latitude, fence.longitude = float(fence.latitude), float(fence.longitude)
+            min_lat, min_lon, max_lat, max_lon = fence.bounding_box()
+            for row in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                for col in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                    self.cells.setdefault((row, col), []).append(fence)
+            self.size += 1
+
+    def _cell(self, degrees):
+        return math.floor(degrees / self.cell_degrees)
+
+    def lookup(self, lat, lon):
+        """Fences containing the point as [(fence, distance_m)], nearest first."""
+        candidates = self.cells.get((self._cell(lat), self._cell(lon)))
+        if not candidates:
+            return []
+        hits = [
+            (fence, distance if distance is not None else 0.0)
+            for fence, inside, distance in evaluate_geofences(lat, lon, candidates)
+            if inside
+        ]
+        return sorted(hits, key=lambda hit: hit[1])
+
+
+GEOFENCE_INDEX_VERSION_KEY = 'venueservices:geofence_index_version'
+
+_index = None
+_index_version = None
+_index_built_at = 0.0
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def invalidate_geofence_index():
+    """Called whenever a venue's location or fence changes, every process rebuilds on its next lookup."""
+    try:
+        cache.incr(GEOFENCE_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(GEOFENCE_INDEX_VERSION_KEY, 1, None)
+
+
+def _build_index():
+    venues = Venue.objects.only('id', 'venue_id', 'name', 'geo_location', 'geofence_radius_m', 'geofence_polygon')
+    return GeofenceIndex(Geofence(venue) for venue in venues.iterator())
+
+
+def venue_geofence_index():
+    """
+    The process wide index, rebuilt when the shared version changes or it is
+    older than GEOFENCE_INDEX_MAX_AGE seconds. The shared version is only
+    consulted every GEOFENCE_INDEX_CHECK_INTERVAL seconds so lookups stay in memory.
+    """
+    global _index, _index_version, _index_built_at, _index_checked_at
+
+    now = time.monotonic()
+    check_interval = getattr(settings, 'GEOFENCE_INDEX_CHECK_INTERVAL', 5)
+    max_age = getattr(settings, 'GEOFENCE_INDEX_MAX_AGE', 300)
+    if _index is not None and now - _index_checked_at < check_interval and now - _index_built_at < max_age:
+        return _index
+
+    with _index_lock:
+        version = cache.get(GEOFENCE_INDEX_VERSION_KEY)
+        _index_checked_at = now
+        if _index is None or version != _index_version or now - _index_built_at >= max_age:
+            _index = _build_index()
+            _index_version = version
+            _index_built_at = now
+        return _index
+
+
+def venues_at(lat, lon):
+    """Venues whose fence contains the point as [(venue, distance_m)], nearest first."""
+    return [(fence.venue, distance) for fence, distance in venue_geofence_index().lookup(lat, lon)]
+
+
+def auto_check_in(user, lat, lon, track_heartbeats=False):
+    """
+    Checks the user in at the nearest venue whose fence contains the point.
+    Returns (venue, presence, created), or None when no fence contains it.
+    """
+    hits = venues_at(lat, lon)
+    if not hits:
+        return None
+    venue, distance = hits[0]
+    presence, created = check_in(user, venue, track_heartbeats=track_heartbeats)
+    return venue, presence, created
+
+
+def _active_presences(user):
+    return list(
+        Presence.objects.filter(user=user, time_out__isnull=True)
+        .select_related('venue')
+        .only(
+            'id', 'time_in', 'time_out', 'venue__id', 'venue__venue_id', 'venue__name',
+            'venue__geo_location', 'venue__geofence_radius_m', 'venue__geofence_polygon',
+        )
+    )
+
+
+def check_active_presences(user, lat, lon, now=None):
+    """
+    Checks the user's location against the fence of every venue they are
+    currently checked in at, and closes the presences that are out of range
+    with a single UPDATE. Returns [(presence, inside, distance_m)].
+    """
+    now = now or timezone.now()
+    presences = _active_presences(user)
+    if not presences:
+        return []
+
+    results = evaluate_geofences(lat, lon, [Geofence(presence.venue) for presence in presences])
+
+    closed_ids = []
+    checked = []
+    for presence, (fence, inside, distance) in zip(presences, results):
+        if not inside:
+            presence.time_out = now
+            closed_ids.append(presence.id)
+        checked.append((presence, inside, distance))
+
+    if closed_ids:
+        close_presences(Presence.objects.filter(id__in=closed_ids), now)
+    return checked
+
+
+def apply_location_trail(user, points):
+    """
+    Replays a chronological trail of (lat, lon, timestamp) points against the
+    user's active presences. Each presence is closed at the timestamp of the
+    first point that falls outside its fence, all closures are written with a
+    single bulk update. Returns the closed presences.
+    """
+    open_presences = _active_presences(user)
+    fences = {presence.id: Geofence(presence.venue) for presence in open_presences}
+    closed = []
+
+    for lat, lon, at in points:
+        if not open_presences:
+            break
+        # Points recorded before a check-in say nothing about that presence
+        candidates = [presence for presence in open_presences if presence.time_in <= at]
+        results = evaluate_geofences(lat, lon, [fences[presence.id] for presence in candidates])
+        for presence, (fence, inside, distance) in zip(candidates, results):
+            if not inside:
+                presence.time_out = at
+                closed.append(presence)
+        open_presences = [presence for presence in open_presences if presence.time_out is None]
+
+    # Presences another request closed in the meantime are left alone
+    return close_presence_objects(closed)
+
+
+def thin_location_trail(points, origin=None, min_move_m=None):
+    """
+    Drops points that are within min_move_m of the last kept point, starting
+    from origin (the last stored location) when given. points must already
+    be in chronological order.
+    """
+    if min_move_m is None:
+        min_move_m = getattr(settings, 'LOCATION_PING_MIN_MOVE_M', 15)
+
+    kept = []
+    last = origin
+    for point in points:
+        lat, lon = point[0], point[1]
+        if last is None or distance_m(last[0], last[1], lat, lon) >= min_move_m:
+            kept.append(point)
+            last = (lat, lon)
+    return kept
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from venueservices.presence import expire_stale_presences, heartbeat_timeout, recount_presence_counters
+
+
+class Command(BaseCommand):
+    help = "Checks out heartbeat tracked presences that missed their heartbeat timeout. Run it every minute or so."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help="Also reset every venue's live presence counter from its open presences.",
+        )
+
+    def handle(self, *args, **options):
+        expired = expire_stale_presences()
+        self.stdout.write(f"Checked out {expired} presence(s) idle for more than {heartbeat_timeout()}s.")
+
+        if options['recount']:
+            venues = recount_presence_counters()
+            self.stdout.write(f"Recounted live presence for {venues} venue(s).")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from venueservices.rollups import downsample, prune_rollups, sample_occupancy
+
+
+class Command(BaseCommand):
+    help = (
+        "Samples live occupancy into minute buckets, downsamples them to hour and day "
+        "buckets and prunes buckets past retention. Run it every minute, each run only "
+        "samples the current minute."
+    )
+
+    def handle(self, *args, **options):
+        sampled = sample_occupancy()
+        written = downsample()
+        pruned = prune_rollups()
+        self.stdout.write(
+            f"Sampled {sampled} venue(s), wrote {written} downsampled bucket(s), pruned {pruned} old bucket(s)."
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venueservices', '0002_booking_date_alter_booking_is_ongoing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presence',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:20
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def recount_venue_presence(apps, schema_editor):
+    Venue = apps.get_model('partner', 'Venue')
+    Presence = apps.get_model('venueservices', 'Presence')
+
+    # current_strength becomes the live count of open presences
+    open_presences = (
+        Presence.objects.filter(venue=OuterRef('pk'), time_out__isnull=True)
+        .order_by()
+        .values('venue')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Venue.objects.update(current_strength=Coalesce(Subquery(open_presences), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partner', '0006_venue_geofence'),
+        ('venueservices', '0003_presence_last_seen'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_venue_presence, migrations.RunPython.noop),
+    ]
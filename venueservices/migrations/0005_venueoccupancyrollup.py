@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partner', '0006_venue_geofence'),
+        ('venueservices', '0004_recount_venue_presence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='presence',
+            name='time_in',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='VenueOccupancyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('occupied_tables', models.PositiveIntegerField(default=0)),
+                ('active_presences', models.PositiveIntegerField(default=0)),
+                ('check_ins', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy_rollups', to='partner.venue')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='venueservic_resolut_9f4c35_idx')],
+                'unique_together': {('venue', 'resolution', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_daily_sales(apps, schema_editor):
+    Booking = apps.get_model('venueservices', 'Booking')
+    DailySalesRollup = apps.get_model('venueservices', 'DailySalesRollup')
+
+    rows = (
+        Booking.objects.filter(is_ongoing=False)
+        .values('venue_id', 'date')
+        .annotate(total_sales=Sum('total_bill'), bookings_count=Count('booking_id'))
+        .order_by()
+    )
+    DailySalesRollup.objects.bulk_create(
+        [
+            DailySalesRollup(
+                venue_id=row['venue_id'],
+                date=row['date'],
+                total_sales=row['total_sales'] or 0,
+                bookings_count=row['bookings_count'],
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partner', '0006_venue_geofence'),
+        ('venueservices', '0005_venueoccupancyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('bookings_count', models.PositiveIntegerField(default=0)),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='partner.venue')),
+            ],
+            options={
+                'unique_together': {('venue', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -49,11 +49,57 @@ class Presence(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     venue = models.ForeignKey('partner.Venue', on_delete=models.CASCADE, related_name='presences')
     user = models.ForeignKey('authentication.CustomUser', on_delete=models.CASCADE, related_name='presences')
-    time_in = models.DateTimeField(default=timezone.now)
+    time_in = models.DateTimeField(default=timezone.now, db_index=True)
     time_out = models.DateTimeField(null=True, blank=True)
+    last_seen = models.DateTimeField(null=True, blank=True, db_index=True)  # Last heartbeat, only for socket tracked presences
 
     class Meta:
         unique_together = ('venue', 'user', 'time_out') 
 
     def __str__(self):
-        return f'{self.user} at {self.venue} from {self.time_in} to {self.time_out or "now"}'
\ No newline at end of file
+        return f'{self.user} at {self.venue} from {self.time_in} to {self.time_out or "now"}'
+
+class VenueOccupancyRollup(models.Model):
+    """
+    Per-venue occupancy and footfall for one time bucket. Minute buckets are
+    sampled and incremented live, hour and day buckets are downsampled from
+    them by venueservices.rollups.
+    """
+    RESOLUTION_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    venue = models.ForeignKey('partner.Venue', on_delete=models.CASCADE, related_name='occupancy_rollups')
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    occupied_tables = models.PositiveIntegerField(default=0)  # Peak within the bucket
+    active_presences = models.PositiveIntegerField(default=0)  # Peak within the bucket
+    check_ins = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('venue', 'resolution', 'bucket_start')
+        indexes = [
+            models.Index(fields=['resolution', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f'{self.venue} {self.resolution} {self.bucket_start}'
+
+
+
+class DailySalesRollup(models.Model):
+    """Completed booking revenue per venue and booking date, kept up to date as bookings end."""
+    venue = models.ForeignKey('partner.Venue', on_delete=models.CASCADE, related_name='daily_sales')
+    date = models.DateField()
+    total_sales = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    bookings_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # The unique index doubles as the (venue, date) range lookup index
+        unique_together = ('venue', 'date')
+
+    def __str__(self):
+        return f'{self.venue} {self.date}: {self.total_sales}'
@@ -0,0 +1,121 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from partner.models import Venue
+from .models import Presence
+from .rollups import record_check_in
+
+
+def heartbeat_timeout():
+    """Seconds without a heartbeat after which a tracked presence is checked out."""
+    return getattr(settings, 'PRESENCE_HEARTBEAT_TIMEOUT', 90)
+
+
+def check_in(user, venue, now=None, track_heartbeats=False):
+    """
+    Opens a presence for user at venue. Presences opened over the presence
+    socket are tracked by heartbeat and expire when the heartbeats stop.
+    Returns (presence, created), an already open presence is returned as is.
+    """
+    existing = Presence.objects.filter(user=user, venue=venue, time_out__isnull=True).first()
+    if existing:
+        return existing, False
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        presence = Presence.objects.create(
+            user=user,
+            venue=venue,
+            time_in=now,
+            last_seen=now if track_heartbeats else None,
+        )
+        Venue.objects.filter(pk=venue.pk).update(current_strength=F('current_strength') + 1)
+        record_check_in(venue.pk, now)
+    return presence, True
+
+
+def _decrement_counters(venue_counts):
+    for venue_pk, closed in venue_counts.items():
+        Venue.objects.filter(pk=venue_pk).update(
+            current_strength=Greatest(F('current_strength') - closed, 0)
+        )
+
+
+def close_presences(presences, time_out):
+    """
+    Closes the still open presences in the queryset at time_out (a value or an
+    expression) and moves each venue's live counter down by as many. Rows are
+    locked first so a presence closed concurrently is only counted once.
+    Returns how many were closed.
+    """
+    with transaction.atomic():
+        rows = list(
+            presences.filter(time_out__isnull=True)
+            .select_for_update()
+            .values_list('id', 'venue_id')
+        )
+        if not rows:
+            return 0
+        Presence.objects.filter(id__in=[presence_id for presence_id, venue_pk in rows]).update(time_out=time_out)
+        _decrement_counters(Counter(venue_pk for presence_id, venue_pk in rows))
+    return len(rows)
+
+
+def close_presence_objects(presences):
+    """Like close_presences for instances that already carry their own time_out, written with one bulk update."""
+    by_id = {presence.id: presence for presence in presences}
+    if not by_id:
+        return []
+
+    with transaction.atomic():
+        still_open = set(
+            Presence.objects.filter(id__in=by_id, time_out__isnull=True)
+            .select_for_update()
+            .values_list('id', flat=True)
+        )
+        closed = [presence for presence_id, presence in by_id.items() if presence_id in still_open]
+        if closed:
+            Presence.objects.bulk_update(closed, ['time_out'])
+            _decrement_counters(Counter(presence.venue_id for presence in closed))
+    return closed
+
+
+def check_out(user, venue=None, now=None):
+    """Closes the user's open presences, at venue only when given. Returns how many were closed."""
+    presences = Presence.objects.filter(user=user)
+    if venue is not None:
+        presences = presences.filter(venue=venue)
+    return close_presences(presences, now or timezone.now())
+
+
+def touch_presences(user, now=None):
+    """Records a heartbeat on all of the user's open presences, which makes them heartbeat tracked."""
+    return Presence.objects.filter(user=user, time_out__isnull=True).update(last_seen=now or timezone.now())
+
+
+def expire_stale_presences(now=None):
+    """
+    Closes heartbeat tracked presences whose last heartbeat is older than the
+    timeout, at the time of that last heartbeat. Presences opened over plain
+    HTTP have no last_seen and are left alone.
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=heartbeat_timeout())
+    return close_presences(Presence.objects.filter(last_seen__lt=cutoff), F('last_seen'))
+
+
+def recount_presence_counters():
+    """Resets every venue's live counter from its open presences, in case the two ever drift."""
+    open_presences = (
+        Presence.objects.filter(venue=OuterRef('pk'), time_out__isnull=True)
+        .order_by()
+        .values('venue')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Venue.objects.update(current_strength=Coalesce(Subquery(open_presences), 0))
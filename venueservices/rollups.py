@@ -0,0 +1,286 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from partner.models import Table, Venue
+from .analytics import invalidate_item_sales
+from .models import DailySalesRollup, VenueOccupancyRollup
+
+MINUTE = 'minute'
+HOUR = 'hour'
+DAY = 'day'
+RESOLUTIONS = (MINUTE, HOUR, DAY)
+
+RESOLUTION_PERIODS = {
+    MINUTE: timedelta(minutes=1),
+    HOUR: timedelta(hours=1),
+    DAY: timedelta(days=1),
+}
+
+# Each coarser resolution is rebuilt from the one before it
+DOWNSAMPLE_STEPS = [
+    (MINUTE, HOUR, TruncHour, RESOLUTION_PERIODS[HOUR]),
+    (HOUR, DAY, TruncDay, RESOLUTION_PERIODS[DAY]),
+]
+
+DEFAULT_RETENTION_DAYS = {MINUTE: 2, HOUR: 90, DAY: 730}
+
+
+def retention_days():
+    return {**DEFAULT_RETENTION_DAYS, **getattr(settings, 'OCCUPANCY_ROLLUP_RETENTION_DAYS', {})}
+
+
+def bucket_start(at, resolution):
+    """Start of the bucket containing at, in the current time zone."""
+    at = timezone.localtime(at)
+    if resolution == MINUTE:
+        return at.replace(second=0, microsecond=0)
+    if resolution == HOUR:
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _increment(model, lookup, increments):
+    """Adds increments to the row matching lookup with F() updates, creating the row if needed."""
+    rows = model.objects.filter(**lookup)
+    updates = {field: F(field) + value for field, value in increments.items()}
+
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **increments)
+    except IntegrityError:
+        # Another request created the row first
+        rows.update(**updates)
+
+
+def _add_to_minute_bucket(venue_pk, at, **increments):
+    start = bucket_start(at or timezone.now(), MINUTE)
+    _increment(
+        VenueOccupancyRollup,
+        {'venue_id': venue_pk, 'resolution': MINUTE, 'bucket_start': start},
+        increments,
+    )
+
+
+def record_check_in(venue_pk, at=None):
+    _add_to_minute_bucket(venue_pk, at, check_ins=1)
+
+
+def record_revenue(venue_pk, amount, at=None):
+    if amount:
+        _add_to_minute_bucket(venue_pk, at, revenue=Decimal(amount))
+
+
+def record_completed_booking(booking):
+    """Adds an ended booking to its day's sales rollup and the occupancy revenue, and drops its day's cached item sales."""
+    _increment(
+        DailySalesRollup,
+        {'venue_id': booking.venue_id, 'date': booking.date},
+        {'total_sales': Decimal(booking.total_bill or 0), 'bookings_count': 1},
+    )
+    record_revenue(booking.venue_id, booking.total_bill)
+    # After commit, so a concurrent read cannot cache the day again without this booking
+    transaction.on_commit(lambda: invalidate_item_sales(booking.venue_id, booking.date))
+
+
+def sales_by_day(venue, start, end):
+    """{date: (total_sales, bookings_count)} for the days in [start, end] that had sales."""
+    return {
+        row['date']: (row['total_sales'], row['bookings_count'])
+        for row in DailySalesRollup.objects.filter(venue=venue, date__gte=start, date__lte=end)
+        .values('date', 'total_sales', 'bookings_count')
+    }
+
+
+def sales_on_days(venue, days):
+    """{date: (total_sales, bookings_count)} for those of the given days that had sales."""
+    return {
+        row['date']: (row['total_sales'], row['bookings_count'])
+        for row in DailySalesRollup.objects.filter(venue=venue, date__in=days)
+        .values('date', 'total_sales', 'bookings_count')
+    }
+
+
+def sales_totals_by_venue(venue_pks, start, end, day):
+    """
+    {venue_pk: (range_sales, range_bookings, day_sales, day_bookings)} for
+    [start, end] and for day within it, from one grouped query over all venues.
+    """
+    rows = (
+        DailySalesRollup.objects.filter(venue_id__in=venue_pks, date__gte=start, date__lte=end)
+        .values('venue_id')
+        .annotate(
+            range_sales=Sum('total_sales'),
+            range_bookings=Sum('bookings_count'),
+            day_sales=Sum('total_sales', filter=Q(date=day)),
+            day_bookings=Sum('bookings_count', filter=Q(date=day)),
+        )
+        .order_by()
+    )
+    return {
+        row['venue_id']: (
+            row['range_sales'] or Decimal('0'),
+            row['range_bookings'] or 0,
+            row['day_sales'] or Decimal('0'),
+            row['day_bookings'] or 0,
+        )
+        for row in rows
+    }
+
+
+def same_day_last_year(day):
+    try:
+        return day.replace(year=day.year - 1)
+    except ValueError:
+        # 29 February
+        return day.replace(year=day.year - 1, day=28)
+
+
+def sample_occupancy(now=None):
+    """
+    Writes the current occupied tables and live presence of every venue into
+    this minute's buckets, keeping the peak if the minute was already sampled.
+    Costs a fixed number of queries however many venues there are.
+    """
+    start = bucket_start(now or timezone.now(), MINUTE)
+
+    occupied = dict(
+        Table.objects.filter(is_occupied=True)
+        .values_list('venue_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    present = dict(Venue.objects.filter(current_strength__gt=0).values_list('id', 'current_strength'))
+
+    samples = {
+        venue_pk: (occupied.get(venue_pk, 0), present.get(venue_pk, 0))
+        for venue_pk in set(occupied) | set(present)
+    }
+
+    # Make sure every sampled venue has a bucket, live increments may have created some already
+    VenueOccupancyRollup.objects.bulk_create(
+        [VenueOccupancyRollup(venue_id=venue_pk, resolution=MINUTE, bucket_start=start) for venue_pk in samples],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+    # Only the gauges are written back, so concurrent check-in and revenue increments are kept
+    to_update = []
+    for bucket in VenueOccupancyRollup.objects.filter(resolution=MINUTE, bucket_start=start, venue_id__in=samples):
+        occupied_tables, active_presences = samples[bucket.venue_id]
+        if occupied_tables > bucket.occupied_tables or active_presences > bucket.active_presences:
+            bucket.occupied_tables = max(bucket.occupied_tables, occupied_tables)
+            bucket.active_presences = max(bucket.active_presences, active_presences)
+            to_update.append(bucket)
+    VenueOccupancyRollup.objects.bulk_update(to_update, ['occupied_tables', 'active_presences'], batch_size=500)
+    return len(samples)
+
+
+def downsample(now=None):
+    """
+    Rebuilds the hour buckets of the last two hours from minute buckets, then
+    the day buckets of the last two days from hour buckets. Rebuilding is
+    idempotent, so the still open current bucket is refreshed on every run.
+    """
+    now = now or timezone.now()
+    written = 0
+    for source, target, trunc, period in DOWNSAMPLE_STEPS:
+        since = bucket_start(now, target) - period
+        rows = (
+            VenueOccupancyRollup.objects.filter(resolution=source, bucket_start__gte=since)
+            .annotate(target_start=trunc('bucket_start', tzinfo=timezone.get_current_timezone()))
+            .values('venue_id', 'target_start')
+            .annotate(
+                peak_tables=Max('occupied_tables'),
+                peak_presences=Max('active_presences'),
+                total_check_ins=Sum('check_ins'),
+                total_revenue=Sum('revenue'),
+            )
+            .order_by()
+        )
+        aggregated = {(row['venue_id'], row['target_start']): row for row in rows}
+        existing = {
+            (bucket.venue_id, bucket.bucket_start): bucket
+            for bucket in VenueOccupancyRollup.objects.filter(resolution=target, bucket_start__gte=since)
+        }
+
+        to_update, to_create = [], []
+        for key, row in aggregated.items():
+            values = {
+                'occupied_tables': row['peak_tables'] or 0,
+                'active_presences': row['peak_presences'] or 0,
+                'check_ins': row['total_check_ins'] or 0,
+                'revenue': row['total_revenue'] or Decimal('0'),
+            }
+            bucket = existing.get(key)
+            if bucket is None:
+                to_create.append(VenueOccupancyRollup(
+                    venue_id=key[0], resolution=target, bucket_start=key[1], **values
+                ))
+            elif any(getattr(bucket, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(bucket, field, value)
+                to_update.append(bucket)
+
+        VenueOccupancyRollup.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+        VenueOccupancyRollup.objects.bulk_update(
+            to_update, ['occupied_tables', 'active_presences', 'check_ins', 'revenue'], batch_size=500
+        )
+        written += len(to_create) + len(to_update)
+    return written
+
+
+def prune_rollups(now=None):
+    """Deletes buckets older than each resolution's retention. Returns how many were deleted."""
+    now = now or timezone.now()
+    deleted = 0
+    for resolution, days in retention_days().items():
+        deleted += VenueOccupancyRollup.objects.filter(
+            resolution=resolution,
+            bucket_start__lt=now - timedelta(days=days),
+        ).delete()[0]
+    return deleted
+
+
+def resolution_for_span(span):
+    """Finest resolution that keeps a series for span at a few hundred points at most."""
+    if span <= timedelta(hours=6):
+        return MINUTE
+    if span <= timedelta(days=14):
+        return HOUR
+    return DAY
+
+
+def occupancy_series(venue, resolution, since, until):
+    return list(
+        VenueOccupancyRollup.objects.filter(
+            venue=venue,
+            resolution=resolution,
+            bucket_start__gte=bucket_start(since, resolution),
+            bucket_start__lt=until,
+        )
+        .order_by('bucket_start')
+        .values('bucket_start', 'occupied_tables', 'active_presences', 'check_ins', 'revenue')
+    )
+
+
+def busy_hours(venue, since, until):
+    """Average peak presence per hour of the day, busiest first, from the hour buckets in range."""
+    totals = {}
+    for bucket in occupancy_series(venue, HOUR, since, until):
+        hour = timezone.localtime(bucket['bucket_start']).hour
+        count, presences = totals.get(hour, (0, 0))
+        totals[hour] = (count + 1, presences + bucket['active_presences'])
+
+    hours = [
+        {"hour": hour, "average_peak_presences": round(presences / count, 1)}
+        for hour, (count, presences) in totals.items()
+    ]
+    return sorted(hours, key=lambda item: (-item["average_peak_presences"], item["hour"]))
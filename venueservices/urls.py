@@ -9,15 +9,23 @@ from .views import (
     GenerateBillView,
     EndBookingView,
     VenueMenuView,
+    MenuSearchView,
     GetCurrentBookingDetailsView, 
     PresenceCheckInView, 
+    PresenceAutoCheckInView,
     PresenceLocationCheckView,
+    PresenceLocationPingsView,
     VenueOngoingBookingsView,
     VenueStaffListView,
+    StaffDirectoryView,
     UserVenuesListView,
     MonthlySalesView,
     DailySalesView,
-    CurrentVenuePresenceView
+    ItemSalesAnalyticsView,
+    SalesExportView,
+    CurrentVenuePresenceView,
+    VenueOccupancyView,
+    OwnerDashboardView
 )
 
 urlpatterns = [
@@ -30,13 +38,21 @@ urlpatterns = [
     path('generate_bill/', GenerateBillView.as_view(), name='generate_bill'),
     path('end_booking/', EndBookingView.as_view(), name='end_booking'),
     path('<str:venue_id>/view_menu/', VenueMenuView.as_view(), name='menu_view'),
+    path('menu_search/', MenuSearchView.as_view(), name='menu_search'),
     path('current_booking_details/', GetCurrentBookingDetailsView.as_view(), name='current_booking_details'),
     path('presence/check-in/', PresenceCheckInView.as_view(), name='presence-check-in'),
+    path('presence/auto-check-in/', PresenceAutoCheckInView.as_view(), name='presence-auto-check-in'),
     path('presence/location-check/', PresenceLocationCheckView.as_view(), name='presence-location-check'),
+    path('presence/location-pings/', PresenceLocationPingsView.as_view(), name='presence-location-pings'),
     path('<str:venue_id>/ongoing_bookings/', VenueOngoingBookingsView.as_view(), name='venue_ongoing_bookings'),
     path('<str:venue_id>/staff_list/', VenueStaffListView.as_view(), name='venue_staff_list'),
+    path('<str:venue_id>/staff_directory/', StaffDirectoryView.as_view(), name='staff_directory'),
     path('associated_venues/', UserVenuesListView.as_view(), name='user_venues_list'),
+    path('owner_dashboard/', OwnerDashboardView.as_view(), name='owner_dashboard'),
     path('<str:venue_id>/monthly_sales/', MonthlySalesView.as_view(), name='monthly_sales'),
     path('<str:venue_id>/daily_sales/', DailySalesView.as_view(), name='daily_sales'),
+    path('<str:venue_id>/item_sales/', ItemSalesAnalyticsView.as_view(), name='item_sales'),
+    path('<str:venue_id>/sales_export/', SalesExportView.as_view(), name='sales_export'),
     path('<str:venue_id>/current_presence/', CurrentVenuePresenceView.as_view(), name='current_venue_presence'),
+    path('<str:venue_id>/occupancy/', VenueOccupancyView.as_view(), name='venue_occupancy'),
 ]
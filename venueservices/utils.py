@@ -0,0 +1,40 @@
+from geopy.distance import geodesic
+
+
+def get_venue_geo(venue):
+    """Safely extract (latitude, longitude) from a venue, either may be None."""
+    venue_geo = venue.geo_location or {}
+    return (
+        venue_geo.get("latitude"),
+        venue_geo.get("longitude"),
+    )
+
+
+def get_user_location(user):
+    """
+    Returns the user's (latitude, longitude) if location permission is granted
+    and a valid location is stored, otherwise None.
+    """
+    if not user.is_location_permission_granted:
+        return None
+
+    user_geo = user.location or {}
+    user_lat = user_geo.get("latitude")
+    user_lon = user_geo.get("longitude")
+
+    if user_lat is None or user_lon is None:
+        return None
+    return (user_lat, user_lon)
+
+
+def venue_distance_km(user_location, venue):
+    """Distance in kilometers from user_location to the venue, or None if unknown."""
+    venue_lat, venue_lon = get_venue_geo(venue)
+    if user_location is None or venue_lat is None or venue_lon is None:
+        return None
+
+    try:
+        return geodesic(user_location, (venue_lat, venue_lon)).kilometers
+    except ValueError:
+        # Handle potential geodesic calculation errors
+        return None
@@ -1,4 +1,5 @@
 from rest_framework.views import APIView
+from backend.db_router import ReplicaReadMixin
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound
 from rest_framework import status
@@ -7,31 +8,34 @@ from django.contrib.auth import get_user_model
 from partner.models import Venue, Table, Menu
 from authentication.models import Waiter, Owner, Manager
 from .models import Booking, Cart, CartItem, Presence
-from geopy.distance import geodesic
+from .analytics import item_sales_report
+from .export import EXPORT_CONTENT_TYPES, EXPORT_FORMATS, EXPORT_STREAMS, decode_cursor, iter_ledger
+from .geofence import apply_location_trail, auto_check_in, check_active_presences, thin_location_trail
+from .presence import check_in
+from .rollups import (
+    busy_hours, occupancy_series, record_completed_booking, resolution_for_span, sales_by_day,
+    sales_on_days, sales_totals_by_venue, same_day_last_year, RESOLUTIONS, RESOLUTION_PERIODS,
+)
+from .utils import get_venue_geo, get_user_location, venue_distance_km
+from partner.permissions import MANAGER, OWNER, WAITER, has_venue_role
+from partner.search import search_menu
 import uuid
-from django.db.models import Sum
+from django.db.models import Case, Count, Q, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-import math
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.pagination import CursorPagination
 from django.shortcuts import get_object_or_404
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from backend.streaming import streaming_response
+from django.db import router, transaction
+from authentication.jwt_auth import CachedJWTAuthentication, invalidate_cached_user
 from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    R = 6371000  # Earth radius in meters
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    d_phi = math.radians(lat2 - lat1)
-    d_lambda = math.radians(lon2 - lon1)
-
-    a = math.sin(d_phi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(d_lambda/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c / 1000  # Convert to kilometers
-
-class FetchVenuesView(APIView):
-    authentication_classes = [JWTAuthentication]
+class FetchVenuesView(ReplicaReadMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
@@ -46,30 +50,12 @@ class FetchVenuesView(APIView):
             if not user_id:
                 raise NotFound({"message": "User ID not found in token."})
 
-            user = get_user_model().objects.get(id=user_id)
+            user = request.user
             venues = Venue.objects.all()
 
-            def get_geo(venue):
-                """Helper function to safely extract latitude & longitude."""
-                venue_geo = venue.geo_location or {}
-                return (
-                    venue_geo.get("latitude"),  # None is acceptable now
-                    venue_geo.get("longitude"),
-                )
-
-            # Initialize variables for location handling
-            user_location = None
-            user_has_location = False
-
-            # Check if user's location permission is granted and has valid location
-            if user.is_location_permission_granted:
-                user_geo = user.location or {}
-                user_lat = user_geo.get("latitude")
-                user_lon = user_geo.get("longitude")
-
-                if user_lat is not None and user_lon is not None:
-                    user_location = (user_lat, user_lon)
-                    user_has_location = True
+            # User location is None unless permission is granted and a valid location is stored
+            user_location = get_user_location(user)
+            user_has_location = user_location is not None
 
             # Prepare venue data with distance calculation
             venue_data = []
@@ -77,16 +63,9 @@ class FetchVenuesView(APIView):
             venues_without_location = []
 
             for venue in venues:
-                venue_lat, venue_lon = get_geo(venue)
+                venue_lat, venue_lon = get_venue_geo(venue)
                 venue_has_location = venue_lat is not None and venue_lon is not None
-                
-                distance = None
-                if user_has_location and venue_has_location:
-                    try:
-                        distance = geodesic(user_location, (venue_lat, venue_lon)).kilometers
-                    except ValueError as e:
-                        # Handle potential geodesic calculation errors
-                        distance = None
+                distance = venue_distance_km(user_location, venue)
 
                 venue_info = {
                     "venue_id": venue.venue_id,
@@ -116,8 +95,6 @@ class FetchVenuesView(APIView):
 
             return Response({"venues": venue_data})
 
-        except get_user_model().DoesNotExist:
-            raise NotFound({"message": "User not found."})
         except Exception as e:
             # Generic error handler for unexpected errors
             return Response(
@@ -126,7 +103,7 @@ class FetchVenuesView(APIView):
             )
 
 class BookingTableView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -153,13 +130,8 @@ class BookingTableView(APIView):
                     code=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Get user object
-            try:
-                user = get_user_model().objects.get(id=user_id)
-            except get_user_model().DoesNotExist:
-                raise NotFound(
-                    {"message": "User not found.", "code": "user_not_found"}
-                )
+            # Loaded by the authentication
+            user = request.user
 
             # Parse QR code and get venue/table
             try:
@@ -207,7 +179,7 @@ class BookingTableView(APIView):
 
             # Update table status
             table.is_occupied = True
-            table.save()
+            table.save(update_fields=['is_occupied'])
 
             # Prepare response data
             users_data = [{
@@ -242,7 +214,7 @@ class BookingTableView(APIView):
             )
 
 class JoinTableView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -270,13 +242,8 @@ class JoinTableView(APIView):
                     code=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Get user object
-            try:
-                user = get_user_model().objects.get(id=user_id)
-            except get_user_model().DoesNotExist:
-                raise NotFound(
-                    {"message": "User not found.", "code": "user_not_found"}
-                )
+            # Loaded by the authentication
+            user = request.user
 
             # Parse QR code and get venue/table
             try:
@@ -369,7 +336,7 @@ class JoinTableView(APIView):
             )
 
 class SendWaiterNotificationView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -458,7 +425,7 @@ class SendWaiterNotificationView(APIView):
             )
 
 class AcceptBookingView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -561,7 +528,7 @@ class AcceptBookingView(APIView):
             )
 
 class AddItemToCartView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -824,7 +791,7 @@ class AddItemToCartView(APIView):
             )
 
 class GenerateBillView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -936,7 +903,7 @@ class GenerateBillView(APIView):
             )
 
 class EndBookingView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -990,11 +957,16 @@ class EndBookingView(APIView):
                          "code": "not_assigned_waiter"}
                     )
 
-            # End the booking
-            booking.table.is_occupied = False
-            booking.is_ongoing = False
-            booking.table.save()
-            booking.save()
+            # End the booking. The conditional update lets only one of several
+            # concurrent end requests flip it, and only that one counts it in the
+            # sales and occupancy rollups, in the same transaction
+            with transaction.atomic():
+                ended = Booking.objects.filter(pk=booking.pk, is_ongoing=True).update(is_ongoing=False)
+                booking.is_ongoing = False
+                booking.table.is_occupied = False
+                booking.table.save(update_fields=['is_occupied'])
+                if ended == 1:
+                    record_completed_booking(booking)
 
             return Response({
                 "message": "Booking ended successfully.",
@@ -1020,8 +992,8 @@ class EndBookingView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class VenueMenuView(APIView):
-    authentication_classes = [JWTAuthentication]
+class VenueMenuView(ReplicaReadMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, venue_id, *args, **kwargs):
@@ -1057,8 +1029,106 @@ class VenueMenuView(APIView):
             "menu": menu_data
         })
     
+class MenuSearchView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def parse_bool(self, value):
+        if value is None:
+            return None
+        return str(value).lower() in ['true', '1', 'yes']
+
+    def parse_price(self, value, name):
+        if value in [None, '']:
+            return None
+        try:
+            return Decimal(value)
+        except Exception:
+            raise ValidationError(
+                {"message": f"{name} must be a number.", "code": "invalid_price"}
+            )
+
+    def get(self, request, *args, **kwargs):
+        try:
+            query = request.query_params.get('q', '').strip()
+            if not query:
+                raise ValidationError(
+                    {"message": "Search query 'q' is required.", "code": "missing_query"}
+                )
+
+            available = self.parse_bool(request.query_params.get('available'))
+            results = search_menu(
+                query,
+                is_veg=self.parse_bool(request.query_params.get('is_veg')),
+                tag=request.query_params.get('tag'),
+                min_price=self.parse_price(request.query_params.get('min_price'), 'min_price'),
+                max_price=self.parse_price(request.query_params.get('max_price'), 'max_price'),
+                available=True if available is None else available,
+            )
+
+            user_location = get_user_location(request.user)
+
+            # Group matching items by venue
+            venues = {}
+            for item, score in results:
+                venue = item.venue
+                if venue.id not in venues:
+                    venue_lat, venue_lon = get_venue_geo(venue)
+                    venues[venue.id] = {
+                        "venue_id": venue.venue_id,
+                        "name": venue.name,
+                        "city": venue.city,
+                        "geo_location": {
+                            "latitude": venue_lat,
+                            "longitude": venue_lon,
+                        },
+                        "venue_image": venue.venue_image.url if venue.venue_image else None,
+                        "distance": venue_distance_km(user_location, venue),
+                        "score": 0,
+                        "items": [],
+                    }
+                venue_info = venues[venue.id]
+                venue_info["score"] = max(venue_info["score"], score)
+                venue_info["items"].append({
+                    "menu_item_id": item.menu_item_id,
+                    "item_name": item.item_name,
+                    "item_description": item.item_description,
+                    "price": str(item.price),
+                    "discount": str(item.discount) if item.discount is not None else None,
+                    "is_available": item.is_available,
+                    "is_veg": item.is_veg,
+                    "tag": item.tag,
+                    "tag_display": item.get_tag_display(),
+                    "image": request.build_absolute_uri(item.image.url) if item.image else None,
+                    "score": score,
+                })
+
+            # Best match first, nearest venue first among equally good matches
+            venue_data = sorted(
+                venues.values(),
+                key=lambda x: (
+                    -x["score"],
+                    x["distance"] if x["distance"] is not None else float('inf'),
+                )
+            )
+
+            return Response({
+                "message": "Menu search completed successfully.",
+                "query": query,
+                "venues_count": len(venue_data),
+                "venues": venue_data
+            }, status=status.HTTP_200_OK)
+
+        except ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {"message": "An error occurred while searching menus.", "error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class GetCurrentBookingDetailsView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -1171,6 +1241,7 @@ class GetCurrentBookingDetailsView(APIView):
             )
 
 class PresenceCheckInView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -1186,15 +1257,45 @@ class PresenceCheckInView(APIView):
         
         venue = get_object_or_404(Venue, venue_id=venue_id)
 
-        # Check if Presence already exists with no time_out (active presence)
-        presence_qs = Presence.objects.filter(user=user, venue=venue, time_out__isnull=True)
-        if presence_qs.exists():
+        # An active presence (no time_out) means the user is already checked in
+        presence, created = check_in(user, venue)
+        if not created:
             return Response({"detail": "User already checked in at this venue."}, status=status.HTTP_400_BAD_REQUEST)
 
-        presence = Presence.objects.create(user=user, venue=venue, time_in=timezone.now())
         return Response({"detail": f"Checked in at {venue.name}", "presence_id": str(presence.id)}, status=status.HTTP_201_CREATED)
 
+class PresenceAutoCheckInView(APIView):
+    """Checks the user in at whichever venue's geofence contains their current location."""
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user = request.user
+        user_type = request.auth.get('user_type') if request.auth else None
+        if user_type != 'customuser':
+            return Response({"detail": "Only customuser can check in."}, status=status.HTTP_403_FORBIDDEN)
+
+        current_location = request.data.get('location') or {}
+        try:
+            lat = float(current_location['latitude'])
+            lon = float(current_location['longitude'])
+        except (KeyError, TypeError, ValueError):
+            return Response({"detail": "Numeric latitude and longitude are required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = auto_check_in(user, lat, lon)
+        if result is None:
+            return Response({"detail": "You are not inside any venue."}, status=status.HTTP_404_NOT_FOUND)
+
+        venue, presence, created = result
+        return Response({
+            "detail": f"Checked in at {venue.name}" if created else f"Already checked in at {venue.name}",
+            "presence_id": str(presence.id),
+            "venue_id": venue.venue_id,
+            "created": created,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
 class PresenceLocationCheckView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -1207,28 +1308,119 @@ class PresenceLocationCheckView(APIView):
         lon = current_location.get('longitude')
         if lat is None or lon is None:
             return Response({"detail": "Latitude and longitude are required."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        presence = Presence.objects.filter(user=user).first()
-        
-        
-        venue_location = presence.venue.geo_location or {}
-        venue_lat = venue_location.get('latitude')
-        venue_lon = venue_location.get('longitude')
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return Response({"detail": "Latitude and longitude must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Every active presence is checked against its venue's fence, out of range ones are closed
+        checked = check_active_presences(user, lat, lon)
+        if not checked:
+            return Response({"detail": "You are not checked in at any venue.", "presences": []}, status=status.HTTP_200_OK)
+
+        presences = [{
+            "presence_id": str(presence.id),
+            "venue_id": presence.venue.venue_id,
+            "venue_name": presence.venue.name,
+            "within_venue": inside,
+            "distance_meters": round(distance, 1) if distance is not None else None,
+            "checked_out": not inside,
+        } for presence, inside, distance in checked]
+
+        if any(not inside for presence, inside, distance in checked):
+            detail = "You are too far from the venue. Checked out automatically."
+        else:
+            detail = "You are within the venue location."
+        return Response({"detail": detail, "presences": presences}, status=status.HTTP_200_OK)
+    
+class PresenceLocationPingsView(APIView):
+    """
+    Accepts a buffer of timestamped location pings from the app in one request.
+    Pings that barely moved are dropped, the rest are replayed against the
+    user's active presences and only the resulting changes are written.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
 
-        if venue_lat is None or venue_lon is None:
-            return Response({"detail": "Venue location is not set properly."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        distance = haversine_distance(float(lat), float(lon), float(venue_lat), float(venue_lon))
+    MAX_PINGS_PER_BATCH = 500
+
+    def _parse_ping_time(self, value, now):
+        if isinstance(value, (int, float)):
+            # Epoch seconds, or milliseconds as sent by most mobile SDKs
+            at = datetime.fromtimestamp(value / 1000 if value > 1e11 else value, tz=dt_timezone.utc)
+        else:
+            at = parse_datetime(str(value)) if value else None
+            if at is None:
+                raise ValueError("Invalid timestamp.")
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at, dt_timezone.utc)
+        # Clock skew on the device must not close a presence in the future
+        return min(at, now)
+
+    def post(self, request):
+        user = request.user
+        user_type = request.auth.get('user_type') if request.auth else None
+        if user_type != 'customuser':
+            return Response({"detail": "Only customuser can send location pings."}, status=status.HTTP_403_FORBIDDEN)
 
-        if distance > 50:  # meters
-            # Remove Presence entry (mark time_out as now)
-            presence.delete()
-            return Response({"detail": "You are too far from the venue. Checked out automatically."}, status=status.HTTP_200_OK)
+        pings = request.data.get('pings')
+        if not isinstance(pings, list) or not pings:
+            return Response({"detail": "pings must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(pings) > self.MAX_PINGS_PER_BATCH:
+            return Response(
+                {"detail": f"At most {self.MAX_PINGS_PER_BATCH} pings can be sent at once."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        now = timezone.now()
+        points = []
+        try:
+            for ping in pings:
+                points.append((
+                    float(ping['latitude']),
+                    float(ping['longitude']),
+                    self._parse_ping_time(ping.get('timestamp'), now),
+                ))
+        except (KeyError, TypeError, ValueError, OverflowError, OSError):
+            return Response(
+                {"detail": "Each ping needs numeric latitude and longitude and a valid timestamp."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        points.sort(key=lambda point: point[2])
+
+        stored = user.location or {}
+        origin = None
+        if stored.get('latitude') is not None and stored.get('longitude') is not None:
+            origin = (float(stored['latitude']), float(stored['longitude']))
+
+        moved = thin_location_trail(points, origin)
+        closed = apply_location_trail(user, moved) if moved else []
+
+        if moved:
+            lat, lon, at = moved[-1]
+            user.location = {"latitude": lat, "longitude": lon}
+            user.is_location_permission_granted = True
+            get_user_model().objects.filter(pk=user.pk).update(
+                location=user.location,
+                is_location_permission_granted=True
+            )
+            invalidate_cached_user(user.pk)
+
+        return Response({
+            "detail": "Location pings processed.",
+            "received": len(points),
+            "applied": len(moved),
+            "location": user.location,
+            "checked_out": [{
+                "presence_id": str(presence.id),
+                "venue_id": presence.venue.venue_id,
+                "venue_name": presence.venue.name,
+                "time_out": presence.time_out,
+            } for presence in closed],
+        }, status=status.HTTP_200_OK)
 
-        return Response({"detail": "You are within the venue location.", "distance_meters": distance}, status=status.HTTP_200_OK)
-    
 class VenueOngoingBookingsView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, venue_id, *args, **kwargs):
@@ -1255,19 +1447,19 @@ class VenueOngoingBookingsView(APIView):
                 
                 # Verify user is associated with the venue
                 if user_type == 'owner':
-                    if not venue.owners.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, OWNER):
                         raise PermissionDenied(
                             {"message": "User is not an owner of this venue.",
                              "code": "not_venue_owner"}
                         )
                 elif user_type == 'manager':
-                    if not venue.managers.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, MANAGER):
                         raise PermissionDenied(
                             {"message": "User is not a manager of this venue.",
                              "code": "not_venue_manager"}
                         )
                 elif user_type == 'waiter':
-                    if not venue.waiters.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, WAITER):
                         raise PermissionDenied(
                             {"message": "User is not a waiter at this venue.",
                              "code": "not_venue_waiter"}
@@ -1322,8 +1514,8 @@ class VenueOngoingBookingsView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-class VenueStaffListView(APIView):
-    authentication_classes = [JWTAuthentication]
+class VenueStaffListView(ReplicaReadMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, venue_id, *args, **kwargs):
@@ -1350,19 +1542,19 @@ class VenueStaffListView(APIView):
                 
                 # Verify user is associated with the venue
                 if user_type == 'owner':
-                    if not venue.owners.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, OWNER):
                         raise PermissionDenied(
                             {"message": "User is not an owner of this venue.",
                              "code": "not_venue_owner"}
                         )
                 elif user_type == 'manager':
-                    if not venue.managers.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, MANAGER):
                         raise PermissionDenied(
                             {"message": "User is not a manager of this venue.",
                              "code": "not_venue_manager"}
                         )
                 elif user_type == 'waiter':
-                    if not venue.waiters.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, WAITER):
                         raise PermissionDenied(
                             {"message": "User is not a waiter at this venue.",
                              "code": "not_venue_waiter"}
@@ -1412,8 +1604,121 @@ class VenueStaffListView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-class UserVenuesListView(APIView):
-    authentication_classes = [JWTAuthentication]
+class StaffDirectoryPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('sort_name', 'id')
+
+
+class StaffDirectoryView(ReplicaReadMixin, APIView):
+    """
+    Owners, managers and waiters of a venue, one cursor page at a time.
+    ?role= (comma separated) filters by role and ?search= matches name or
+    phone number. Each entry lists who the member reports to, prefetched for
+    the whole page, so a page costs the same few queries at any size.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    ROLES = [OWNER, MANAGER, WAITER]
+
+    def get(self, request, venue_id, *args, **kwargs):
+        try:
+            user_type = request.auth.payload.get('user_type')
+            if user_type not in self.ROLES:
+                raise PermissionDenied(
+                    {"message": "Only venue staff can access this information.",
+                     "code": "invalid_user_type"}
+                )
+
+            try:
+                venue = Venue.objects.get(venue_id=venue_id)
+            except Venue.DoesNotExist:
+                raise NotFound({"message": "Venue not found.", "code": "venue_not_found"})
+
+            if not has_venue_role(request, venue.venue_id, user_type):
+                raise PermissionDenied(
+                    {"message": "User is not associated with this venue.", "code": "not_venue_staff"}
+                )
+
+            roles = self.ROLES
+            if request.query_params.get('role'):
+                roles = [role.strip().lower() for role in request.query_params['role'].split(',')]
+                if not set(roles) <= set(self.ROLES):
+                    raise ValidationError(
+                        {"message": f"role must be one of: {', '.join(self.ROLES)}.", "code": "invalid_role"}
+                    )
+
+            role_filters = {
+                OWNER: Q(owner__owner_venues=venue),
+                MANAGER: Q(manager__venue=venue),
+                WAITER: Q(waiter__venue=venue),
+            }
+            membership = Q()
+            for role in roles:
+                membership |= role_filters[role]
+
+            staff = (
+                get_user_model().objects.filter(membership)
+                .annotate(
+                    role=Case(*[When(role_filters[role], then=Value(role)) for role in roles]),
+                    sort_name=Coalesce('name', Value('')),
+                )
+                .select_related('manager', 'waiter')
+                .prefetch_related('manager__owners', 'waiter__managers')
+                .only('id', 'name', 'email', 'phone_number', 'manager__user', 'waiter__user')
+                .distinct()
+            )
+            search = request.query_params.get('search', '').strip()
+            if search:
+                staff = staff.filter(Q(name__icontains=search) | Q(phone_number__icontains=search))
+
+            paginator = StaffDirectoryPagination()
+            page = paginator.paginate_queryset(staff, request, view=self)
+
+            staff_data = []
+            for member in page:
+                # Managers report to the venue's owners, waiters to its managers
+                if member.role == MANAGER:
+                    reports_to = [str(owner.pk) for owner in member.manager.owners.all()]
+                elif member.role == WAITER:
+                    reports_to = [str(manager.pk) for manager in member.waiter.managers.all()]
+                else:
+                    reports_to = []
+                staff_data.append({
+                    "staff_id": str(member.id),
+                    "name": member.name,
+                    "email": member.email,
+                    "phone_number": member.phone_number,
+                    "role": member.role,
+                    "reports_to": reports_to,
+                })
+
+            return Response({
+                "message": "Staff directory retrieved successfully.",
+                "code": "staff_directory_retrieved",
+                "venue": {
+                    "venue_id": str(venue.venue_id),
+                    "name": venue.name
+                },
+                "staff": staff_data,
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link()
+            }, status=status.HTTP_200_OK)
+
+        except (PermissionDenied, NotFound, ValidationError):
+            raise
+        except Exception as e:
+            return Response(
+                {"message": "An error occurred while fetching the staff directory.",
+                 "code": "server_error",
+                 "error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class UserVenuesListView(ReplicaReadMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
@@ -1487,8 +1792,27 @@ class UserVenuesListView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class DailySalesView(APIView):
-    authentication_classes = [JWTAuthentication]
+def parse_sales_date(value, name):
+    """Parses an optional YYYY-MM-DD query parameter."""
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({"message": f"{name} must be a date in YYYY-MM-DD format.", "code": "invalid_date"})
+    return parsed
+
+
+def sales_change_percent(current, previous):
+    if not previous:
+        return None
+    return round(float((Decimal(current) - Decimal(previous)) / Decimal(previous) * 100), 2)
+
+
+class DailySalesView(ReplicaReadMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, venue_id, *args, **kwargs):
@@ -1515,19 +1839,19 @@ class DailySalesView(APIView):
                 
                 # Verify user association
                 if user_type == 'owner':
-                    if not venue.owners.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, OWNER):
                         raise PermissionDenied(
                             {"message": "User is not an owner of this venue.",
                              "code": "not_venue_owner"}
                         )
                 elif user_type == 'manager':
-                    if not venue.managers.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, MANAGER):
                         raise PermissionDenied(
                             {"message": "User is not a manager of this venue.",
                              "code": "not_venue_manager"}
                         )
                 elif user_type == 'waiter':
-                    if not venue.waiters.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, WAITER):
                         raise PermissionDenied(
                             {"message": "User is not a waiter at this venue.",
                              "code": "not_venue_waiter"}
@@ -1538,26 +1862,38 @@ class DailySalesView(APIView):
                      "code": "venue_not_found"}
                 )
 
-            # Calculate daily sales
-            today = timezone.now().date()
-            daily_sales = Booking.objects.filter(
-                venue=venue,
-                is_ongoing=False,
-                date=today
-            ).aggregate(total_sales=Sum('total_bill'))['total_sales'] or 0
+            # Daily sales come from the rollup, ?date=YYYY-MM-DD defaults to today
+            day = parse_sales_date(request.query_params.get('date'), 'date') or timezone.now().date()
+            compare_yoy = request.query_params.get('compare') == 'yoy'
 
-            return Response({
+            last_year = same_day_last_year(day)
+            sales = sales_on_days(venue, [day, last_year] if compare_yoy else [day])
+            daily_sales, bookings_count = sales.get(day, (0, 0))
+
+            response = {
                 "message": "Daily sales retrieved successfully.",
                 "code": "daily_sales_retrieved",
                 "venue": {
                     "venue_id": str(venue.venue_id),
                     "name": venue.name
                 },
-                "date": today,
+                "date": day,
                 "total_sales": float(daily_sales),
+                "bookings_count": bookings_count,
                 "currency": "INR"
-            }, status=status.HTTP_200_OK)
+            }
+            if compare_yoy:
+                previous_sales, previous_count = sales.get(last_year, (0, 0))
+                response["previous_year"] = {
+                    "date": last_year,
+                    "total_sales": float(previous_sales),
+                    "bookings_count": previous_count,
+                    "change_percent": sales_change_percent(daily_sales, previous_sales),
+                }
+            return Response(response, status=status.HTTP_200_OK)
 
+        except (PermissionDenied, NotFound, ValidationError):
+            raise
         except Exception as e:
             return Response(
                 {"message": "An error occurred while fetching daily sales.",
@@ -1566,8 +1902,8 @@ class DailySalesView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class MonthlySalesView(APIView):
-    authentication_classes = [JWTAuthentication]
+class MonthlySalesView(ReplicaReadMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, venue_id, *args, **kwargs):
@@ -1594,19 +1930,19 @@ class MonthlySalesView(APIView):
                 
                 # Verify user association
                 if user_type == 'owner':
-                    if not venue.owners.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, OWNER):
                         raise PermissionDenied(
                             {"message": "User is not an owner of this venue.",
                              "code": "not_venue_owner"}
                         )
                 elif user_type == 'manager':
-                    if not venue.managers.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, MANAGER):
                         raise PermissionDenied(
                             {"message": "User is not a manager of this venue.",
                              "code": "not_venue_manager"}
                         )
                 elif user_type == 'waiter':
-                    if not venue.waiters.filter(user_id=user_id).exists():
+                    if not has_venue_role(request, venue.venue_id, WAITER):
                         raise PermissionDenied(
                             {"message": "User is not a waiter at this venue.",
                              "code": "not_venue_waiter"}
@@ -1617,59 +1953,82 @@ class MonthlySalesView(APIView):
                      "code": "venue_not_found"}
                 )
 
-            # Calculate monthly sales with daily breakdown
-            today = timezone.now()
-            first_day = today.replace(day=1)
-            last_day = (first_day + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            # Get all completed bookings for the month
-            bookings = Booking.objects.filter(
-                venue=venue,
-                is_ongoing=False,
-                date__gte=first_day,
-                date__lte=last_day
-            )
-            
-            # Calculate total monthly sales
-            monthly_total = bookings.aggregate(
-                total_sales=Sum('total_bill')
-            )['total_sales'] or 0
-            
-            # Get daily breakdown
-            daily_sales = bookings.values('date').annotate(
-                daily_total=Sum('total_bill')
-            ).order_by('date')
-            
-            # Format daily sales data
+            # Defaults to the current month, ?month=&year= picks another one and
+            # ?from=&to= (YYYY-MM-DD) any range of up to a year
+            today = timezone.now().date()
+            start = parse_sales_date(request.query_params.get('from'), 'from')
+            end = parse_sales_date(request.query_params.get('to'), 'to')
+            if start or end:
+                if not (start and end):
+                    raise ValidationError({"message": "from and to must be given together.", "code": "invalid_range"})
+            else:
+                try:
+                    year = int(request.query_params.get('year', today.year))
+                    month = int(request.query_params.get('month', today.month))
+                    start = date(year, month, 1)
+                except ValueError:
+                    raise ValidationError({"message": "Invalid month or year.", "code": "invalid_month"})
+                end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            if start > end or (end - start).days > 366:
+                raise ValidationError(
+                    {"message": "from must not be after to, and the range is limited to a year.",
+                     "code": "invalid_range"}
+                )
+            compare_yoy = request.query_params.get('compare') == 'yoy'
+
+            sales = sales_by_day(venue, start, end)
+            previous_sales = {}
+            if compare_yoy:
+                previous_sales = sales_by_day(venue, same_day_last_year(start), same_day_last_year(end))
+
+            # Format daily sales data, days without sales are zero
             daily_sales_data = []
-            current_date = first_day
-            while current_date <= last_day:
-                daily_total = 0
-                for sale in daily_sales:
-                    if sale['date'] == current_date:
-                        daily_total = sale['daily_total']
-                        break
-                
-                daily_sales_data.append({
+            monthly_total = Decimal('0')
+            previous_total = Decimal('0')
+            current_date = start
+            while current_date <= end:
+                daily_total, bookings_count = sales.get(current_date, (0, 0))
+                monthly_total += daily_total
+                day_data = {
                     "date": current_date,
-                    "total_sales": float(daily_total)
-                })
+                    "total_sales": float(daily_total),
+                    "bookings_count": bookings_count
+                }
+                if compare_yoy:
+                    last_year = same_day_last_year(current_date)
+                    previous_daily_total = previous_sales.get(last_year, (0, 0))[0]
+                    day_data["previous_year_total_sales"] = float(previous_daily_total)
+                daily_sales_data.append(day_data)
                 current_date += timedelta(days=1)
+            if compare_yoy:
+                previous_total = sum((total for total, count in previous_sales.values()), Decimal('0'))
 
-            return Response({
+            response = {
                 "message": "Monthly sales retrieved successfully.",
                 "code": "monthly_sales_retrieved",
                 "venue": {
                     "venue_id": str(venue.venue_id),
                     "name": venue.name
                 },
-                "month": today.month,
-                "year": today.year,
+                "month": start.month,
+                "year": start.year,
+                "from": start,
+                "to": end,
                 "total_sales": float(monthly_total),
                 "daily_sales": daily_sales_data,
                 "currency": "INR"
-            }, status=status.HTTP_200_OK)
+            }
+            if compare_yoy:
+                response["previous_year"] = {
+                    "from": same_day_last_year(start),
+                    "to": same_day_last_year(end),
+                    "total_sales": float(previous_total),
+                    "change_percent": sales_change_percent(monthly_total, previous_total),
+                }
+            return Response(response, status=status.HTTP_200_OK)
 
+        except (PermissionDenied, NotFound, ValidationError):
+            raise
         except Exception as e:
             return Response(
                 {"message": "An error occurred while fetching monthly sales.",
@@ -1678,27 +2037,184 @@ class MonthlySalesView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-class CurrentVenuePresenceView(APIView):
-    authentication_classes = [JWTAuthentication]
+class ItemSalesAnalyticsView(APIView):
+    """Top menu items, revenue by tag and attach rates for a venue over a date range."""
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, venue_id, *args, **kwargs):
         try:
-            # Get the venue
-            venue = get_object_or_404(Venue, venue_id=venue_id)
+            user_type = request.auth.payload.get('user_type')
+            if user_type not in ['owner', 'manager']:
+                raise PermissionDenied(
+                    {"message": "Only venue owners or managers can access sales analytics.",
+                     "code": "invalid_user_type"}
+                )
+            user_id = request.auth.payload.get('user_id')
+
+            try:
+                venue = Venue.objects.get(venue_id=venue_id)
+            except Venue.DoesNotExist:
+                raise NotFound({"message": "Venue not found.", "code": "venue_not_found"})
+
+            if user_type == 'owner' and not has_venue_role(request, venue.venue_id, OWNER):
+                raise PermissionDenied({"message": "User is not an owner of this venue.", "code": "not_venue_owner"})
+            if user_type == 'manager' and not has_venue_role(request, venue.venue_id, MANAGER):
+                raise PermissionDenied({"message": "User is not a manager of this venue.", "code": "not_venue_manager"})
+
+            # Defaults to the last 30 days, ranges are limited to two years
+            end = parse_sales_date(request.query_params.get('to'), 'to') or timezone.now().date()
+            start = parse_sales_date(request.query_params.get('from'), 'from') or end - timedelta(days=29)
+            if start > end or (end - start).days > 731:
+                raise ValidationError(
+                    {"message": "from must not be after to, and the range is limited to two years.",
+                     "code": "invalid_range"}
+                )
+            try:
+                limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+            except ValueError:
+                raise ValidationError({"message": "limit must be a number.", "code": "invalid_limit"})
+
+            report = item_sales_report(venue, start, end, limit)
+
+            return Response({
+                "message": "Item sales analytics retrieved successfully.",
+                "code": "item_sales_retrieved",
+                "venue": {
+                    "venue_id": str(venue.venue_id),
+                    "name": venue.name
+                },
+                "from": start,
+                "to": end,
+                **report,
+                "currency": "INR"
+            }, status=status.HTTP_200_OK)
+
+        except (PermissionDenied, NotFound, ValidationError):
+            raise
+        except Exception as e:
+            return Response(
+                {"message": "An error occurred while fetching item sales analytics.",
+                 "code": "server_error",
+                 "error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class SalesExportView(ReplicaReadMixin, APIView):
+    """
+    Streams the ledger of completed bookings, their cart items and totals for
+    a venue and date range as CSV or JSON lines. Every booking carries a
+    cursor, an interrupted download resumes with ?cursor=<last cursor received>.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, venue_id, *args, **kwargs):
+        try:
+            user_type = request.auth.payload.get('user_type')
+            if user_type not in ['owner', 'manager']:
+                raise PermissionDenied(
+                    {"message": "Only venue owners or managers can export sales.",
+                     "code": "invalid_user_type"}
+                )
+            user_id = request.auth.payload.get('user_id')
+
+            try:
+                venue = Venue.objects.get(venue_id=venue_id)
+            except Venue.DoesNotExist:
+                raise NotFound({"message": "Venue not found.", "code": "venue_not_found"})
+
+            if user_type == 'owner' and not has_venue_role(request, venue.venue_id, OWNER):
+                raise PermissionDenied({"message": "User is not an owner of this venue.", "code": "not_venue_owner"})
+            if user_type == 'manager' and not has_venue_role(request, venue.venue_id, MANAGER):
+                raise PermissionDenied({"message": "User is not a manager of this venue.", "code": "not_venue_manager"})
+
+            # Defaults to the current month, ranges are limited to two years
+            today = timezone.now().date()
+            end = parse_sales_date(request.query_params.get('to'), 'to') or today
+            start = parse_sales_date(request.query_params.get('from'), 'from') or end.replace(day=1)
+            if start > end or (end - start).days > 731:
+                raise ValidationError(
+                    {"message": "from must not be after to, and the range is limited to two years.",
+                     "code": "invalid_range"}
+                )
+
+            export_format = request.query_params.get('file_type', 'csv').lower()
+            if export_format not in EXPORT_FORMATS:
+                raise ValidationError(
+                    {"message": f"file_type must be one of: {', '.join(EXPORT_FORMATS)}.",
+                     "code": "invalid_file_type"}
+                )
+
+            after = None
+            if request.query_params.get('cursor'):
+                try:
+                    after = decode_cursor(request.query_params['cursor'])
+                except ValueError:
+                    raise ValidationError({"message": "Invalid cursor.", "code": "invalid_cursor"})
+
+        except (PermissionDenied, NotFound, ValidationError):
+            raise
+        except Exception as e:
+            return Response(
+                {"message": "An error occurred while exporting sales.",
+                 "code": "server_error",
+                 "error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        # Nothing is read until the response is iterated, after this request's
+        # routing scope has ended, so the database is picked now
+        ledger = iter_ledger(venue, start, end, after, using=router.db_for_read(Booking))
+        response = streaming_response(
+            request,
+            EXPORT_STREAMS[export_format](ledger),
+            content_type=EXPORT_CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{venue.venue_id}_sales_{start}_{end}.{export_format}"'
+        )
+        return response
+
+class PresenceCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-time_in', '-id')
+
+
+class CurrentVenuePresenceView(ReplicaReadMixin, APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, venue_id, *args, **kwargs):
+        try:
+            # Lists the contact details of everyone present, so only the venue's staff may see it
+            user_type = request.auth.payload.get('user_type')
+            if user_type not in (OWNER, MANAGER, WAITER):
+                raise PermissionDenied({"message": "Only venue staff can access this information."})
+
+            try:
+                venue = Venue.objects.get(venue_id=venue_id)
+            except Venue.DoesNotExist:
+                raise NotFound({"message": "Venue not found."})
+
+            if not has_venue_role(request, venue.venue_id, user_type):
+                raise PermissionDenied({"message": "User is not associated with this venue."})
             
-            # Get all active presences (where time_out is null)
+            # Active presences (time_out is null), newest check-in first, one page at a time
             active_presences = Presence.objects.filter(
                 venue=venue,
                 time_out__isnull=True
-            ).select_related('user')
-            
-            # Count of currently present users
-            present_users_count = active_presences.count()
+            ).select_related('user').only(
+                'id', 'time_in', 'user__id', 'user__name', 'user__email', 'user__phone_number'
+            )
+            paginator = PresenceCursorPagination()
+            page = paginator.paginate_queryset(active_presences, request, view=self)
             
             # Prepare user details
             present_users = []
-            for presence in active_presences:
+            for presence in page:
                 user = presence.user
                 present_users.append({
                     "user_id": str(user.id),
@@ -1715,14 +2231,220 @@ class CurrentVenuePresenceView(APIView):
                     "venue_id": str(venue.venue_id),
                     "name": venue.name
                 },
-                "present_users_count": present_users_count,
+                # Live counter kept up to date on every check-in and check-out
+                "present_users_count": venue.current_strength,
                 "present_users": present_users,
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
                 "last_updated": timezone.now()
             }, status=status.HTTP_200_OK)
 
+        except (PermissionDenied, NotFound):
+            raise
         except Exception as e:
             return Response(
                 {"message": "An error occurred while fetching venue presence.",
                  "error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class VenueOccupancyView(ReplicaReadMixin, APIView):
+    """
+    Occupancy, footfall and revenue over time for venue dashboards, read from
+    the rollup buckets. The resolution follows the requested span unless one
+    is asked for explicitly.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    MAX_POINTS = 2000
+
+    def _parse_bound(self, value, name):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            if parsed_date is None:
+                raise ValidationError({"message": f"{name} must be an ISO date or datetime.", "code": "invalid_range"})
+            parsed = datetime.combine(parsed_date, datetime.min.time())
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def get(self, request, venue_id, *args, **kwargs):
+        try:
+            user_type = request.auth.payload.get('user_type')
+            if user_type not in ['owner', 'manager']:
+                raise PermissionDenied(
+                    {"message": "Only venue owners or managers can access occupancy data.",
+                     "code": "invalid_user_type"}
+                )
+            user_id = request.auth.payload.get('user_id')
+
+            try:
+                venue = Venue.objects.get(venue_id=venue_id)
+            except Venue.DoesNotExist:
+                raise NotFound({"message": "Venue not found.", "code": "venue_not_found"})
+
+            if user_type == 'owner' and not has_venue_role(request, venue.venue_id, OWNER):
+                raise PermissionDenied({"message": "User is not an owner of this venue.", "code": "not_venue_owner"})
+            if user_type == 'manager' and not has_venue_role(request, venue.venue_id, MANAGER):
+                raise PermissionDenied({"message": "User is not a manager of this venue.", "code": "not_venue_manager"})
+
+            # Defaults to the last 24 hours
+            until = timezone.now()
+            if request.query_params.get('to'):
+                until = self._parse_bound(request.query_params['to'], 'to')
+            since = until - timedelta(hours=24)
+            if request.query_params.get('from'):
+                since = self._parse_bound(request.query_params['from'], 'from')
+            if since >= until:
+                raise ValidationError({"message": "from must be before to.", "code": "invalid_range"})
+
+            resolution = request.query_params.get('resolution') or resolution_for_span(until - since)
+            if resolution not in RESOLUTIONS:
+                raise ValidationError(
+                    {"message": f"resolution must be one of: {', '.join(RESOLUTIONS)}.", "code": "invalid_resolution"}
+                )
+            if (until - since) / RESOLUTION_PERIODS[resolution] > self.MAX_POINTS:
+                raise ValidationError(
+                    {"message": "Range too large for this resolution, use a coarser one.", "code": "range_too_large"}
+                )
+
+            series = occupancy_series(venue, resolution, since, until)
+
+            return Response({
+                "message": "Venue occupancy retrieved successfully.",
+                "code": "venue_occupancy_retrieved",
+                "venue": {
+                    "venue_id": str(venue.venue_id),
+                    "name": venue.name
+                },
+                "from": since,
+                "to": until,
+                "resolution": resolution,
+                "current_strength": venue.current_strength,
+                "totals": {
+                    "check_ins": sum(bucket['check_ins'] for bucket in series),
+                    "revenue": float(sum((bucket['revenue'] for bucket in series), Decimal('0'))),
+                    "peak_presences": max((bucket['active_presences'] for bucket in series), default=0),
+                    "peak_occupied_tables": max((bucket['occupied_tables'] for bucket in series), default=0),
+                },
+                "busy_hours": busy_hours(venue, since, until),
+                "series": [{
+                    "bucket_start": bucket['bucket_start'],
+                    "occupied_tables": bucket['occupied_tables'],
+                    "active_presences": bucket['active_presences'],
+                    "check_ins": bucket['check_ins'],
+                    "revenue": float(bucket['revenue']),
+                } for bucket in series],
+                "currency": "INR"
+            }, status=status.HTTP_200_OK)
+
+        except (PermissionDenied, NotFound, ValidationError):
+            raise
+        except Exception as e:
+            return Response(
+                {"message": "An error occurred while fetching venue occupancy.",
+                 "code": "server_error",
+                 "error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class OwnerDashboardView(ReplicaReadMixin, APIView):
+    """
+    Table occupancy, live presence and sales for every venue of the owner in
+    one response. Runs two grouped queries however many venues the owner has,
+    the ownership check is part of the venue query.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            user_type = request.auth.payload.get('user_type')
+            if user_type != 'owner':
+                raise PermissionDenied(
+                    {"message": "Only owners can access the dashboard.",
+                     "code": "invalid_user_type"}
+                )
+            user_id = request.auth.payload.get('user_id')
+            if not user_id:
+                raise PermissionDenied(
+                    {"message": "User ID not found in token.",
+                     "code": "missing_user_id"}
+                )
+
+            # ?date=YYYY-MM-DD defaults to today, month figures cover its month up to that day
+            day = parse_sales_date(request.query_params.get('date'), 'date') or timezone.now().date()
+            month_start = day.replace(day=1)
+
+            venues = list(
+                Venue.objects.filter(owners__user_id=user_id)
+                .annotate(
+                    total_tables=Count('tables', distinct=True),
+                    occupied_tables=Count('tables', filter=Q(tables__is_occupied=True), distinct=True),
+                )
+                .only('id', 'venue_id', 'name', 'city', 'total_capacity', 'current_strength')
+                .order_by('name')
+            )
+            sales = sales_totals_by_venue([venue.pk for venue in venues], month_start, day, day)
+
+            venue_data = []
+            totals = {
+                "total_tables": 0,
+                "occupied_tables": 0,
+                "current_strength": 0,
+                "daily_sales": Decimal('0'),
+                "daily_bookings": 0,
+                "monthly_sales": Decimal('0'),
+                "monthly_bookings": 0,
+            }
+            for venue in venues:
+                monthly_sales, monthly_bookings, daily_sales, daily_bookings = sales.get(
+                    venue.pk, (Decimal('0'), 0, Decimal('0'), 0)
+                )
+                venue_data.append({
+                    "venue_id": str(venue.venue_id),
+                    "name": venue.name,
+                    "city": venue.city,
+                    "total_tables": venue.total_tables,
+                    "occupied_tables": venue.occupied_tables,
+                    "empty_tables": venue.total_tables - venue.occupied_tables,
+                    "total_capacity": venue.total_capacity,
+                    "current_strength": venue.current_strength,
+                    "daily_sales": float(daily_sales),
+                    "daily_bookings": daily_bookings,
+                    "monthly_sales": float(monthly_sales),
+                    "monthly_bookings": monthly_bookings,
+                })
+                totals["total_tables"] += venue.total_tables
+                totals["occupied_tables"] += venue.occupied_tables
+                totals["current_strength"] += venue.current_strength
+                totals["daily_sales"] += daily_sales
+                totals["daily_bookings"] += daily_bookings
+                totals["monthly_sales"] += monthly_sales
+                totals["monthly_bookings"] += monthly_bookings
+            totals["daily_sales"] = float(totals["daily_sales"])
+            totals["monthly_sales"] = float(totals["monthly_sales"])
+
+            return Response({
+                "message": "Owner dashboard retrieved successfully.",
+                "code": "owner_dashboard_retrieved",
+                "date": day,
+                "month_from": month_start,
+                "venues_count": len(venue_data),
+                "totals": totals,
+                "venues": venue_data,
+                "currency": "INR",
+                "last_updated": timezone.now()
+            }, status=status.HTTP_200_OK)
+
+        except (PermissionDenied, ValidationError):
+            raise
+        except Exception as e:
+            return Response(
+                {"message": "An error occurred while fetching the owner dashboard.",
+                 "code": "server_error",
+                 "error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
\ No newline at end of file